@@ -20,6 +20,8 @@ class RepositoryLocator(object):
     DEFAULT_EVENT_ROUTER = recall.event_router.StdOut
     DEFAULT_SNAPSHOT_STORE = recall.snapshot_store.Memory
     DEFAULT_SNAPSHOT_FREQUENCY = 10
+    DEFAULT_SNAPSHOT_WORKERS = 0
+    DEFAULT_SNAPSHOT_BACKLOG = 100
 
     def __init__(self, settings=None):
         assert isinstance(settings, dict) or settings is None
@@ -28,6 +30,9 @@ class RepositoryLocator(object):
         self.locator_event_router = Locator(self.settings)
         self.locator_event_store = Locator(self.settings)
         self.locator_snapshot_store = Locator(self.settings)
+        self.locator_snapshot_policy = Locator(self.settings)
+        self.locator_snapshot_codec = Locator(self.settings)
+        self.locator_identity_map = Locator(self.settings)
 
     def _get_event_router(self, settings):
         """
@@ -59,7 +64,9 @@ class RepositoryLocator(object):
 
     def _get_snapshot_store(self, settings):
         """
-        Locate a snapshot store, or use default
+        Locate a snapshot store, or use default. If a snapshot codec is
+        configured for the aggregate root, the store is created for that root
+        alone, with that codec.
 
         :param settings: The configuration settings
         :type settings: :class:`dict`
@@ -68,6 +75,11 @@ class RepositoryLocator(object):
         """
         assert isinstance(settings, dict)
         cls = settings.get("snapshot_store")
+        codec = settings.get("snapshot_codec")
+        if codec:
+            codec = self.locator_snapshot_codec.locate(codec)
+            return (self.locator_snapshot_store.create(cls, codec=codec)
+                    if cls else self.DEFAULT_SNAPSHOT_STORE(codec=codec))
         return (self.locator_snapshot_store.locate(cls)
                 if cls else self.DEFAULT_SNAPSHOT_STORE())
 
@@ -84,6 +96,72 @@ class RepositoryLocator(object):
         return (settings.get("snapshot_frequency")
                 or self.DEFAULT_SNAPSHOT_FREQUENCY)
 
+    def _get_snapshot_policy(self, settings):
+        """
+        Locate a snapshot policy, or use the repository's default
+
+        :param settings: The configuration settings
+        :type settings: :class:`dict`
+
+        :rtype: :class:`recall.snapshot_policy.SnapshotPolicy`
+        """
+        assert isinstance(settings, dict)
+        cls = settings.get("snapshot_policy")
+        return self.locator_snapshot_policy.locate(cls) if cls else None
+
+    def _get_identity_map(self, settings):
+        """
+        Locate an identity map, or use the repository's default. Repositories
+        configured with the same identity map class share a single map, so
+        its bounds apply to all of their aggregate roots together.
+
+        :param settings: The configuration settings
+        :type settings: :class:`dict`
+
+        :rtype: :class:`collections.MutableMapping`
+        """
+        assert isinstance(settings, dict)
+        cls = settings.get("identity_map")
+        return self.locator_identity_map.locate(cls) if cls else None
+
+    def _get_trusted_replay(self, settings):
+        """
+        Get whether stored events are replayed without checking them
+
+        :param settings: The configuration settings
+        :type settings: :class:`dict`
+
+        :rtype: :class:`bool`
+        """
+        assert isinstance(settings, dict)
+        return bool(settings.get("trusted_replay"))
+
+    def _get_snapshot_workers(self, settings):
+        """
+        Get the number of background snapshot workers, or use default
+
+        :param settings: The configuration settings
+        :type settings: :class:`dict`
+
+        :rtype: :class:`int`
+        """
+        assert isinstance(settings, dict)
+        return (settings.get("snapshot_workers")
+                or self.DEFAULT_SNAPSHOT_WORKERS)
+
+    def _get_snapshot_backlog(self, settings):
+        """
+        Get the background snapshot backlog size, or use default
+
+        :param settings: The configuration settings
+        :type settings: :class:`dict`
+
+        :rtype: :class:`int`
+        """
+        assert isinstance(settings, dict)
+        return (settings.get("snapshot_backlog")
+                or self.DEFAULT_SNAPSHOT_BACKLOG)
+
     def locate(self, ar_cls):
         """
         Load a repository for given aggregate root by its fully-qualified class
@@ -103,7 +181,12 @@ class RepositoryLocator(object):
                 ar_cls, self._get_event_store(settings),
                 self._get_snapshot_store(settings),
                 self._get_event_router(settings),
-                self._get_snapshot_frequency(settings))
+                self._get_snapshot_frequency(settings),
+                self._get_snapshot_workers(settings),
+                self._get_snapshot_backlog(settings),
+                self._get_snapshot_policy(settings),
+                self._get_identity_map(settings),
+                self._get_trusted_replay(settings))
 
         return self.identity_map[fqcn]
 
@@ -131,13 +214,26 @@ class Locator(object):
         """
         assert isinstance(fqcn, (str, unicode))
         if not self.identity_map.get(fqcn):
-            class_name = fqcn.split(".")[-1]
-            module_name = ".".join(fqcn.split(".")[0:-1])
-            mdl = __import__(module_name, globals(), locals(), [class_name], 0)
-            if class_name not in dir(mdl):
-                raise ServiceNotFoundError("Could not locate %s" % fqcn)
-            cls = getattr(mdl, class_name)
-            settings = self.settings.get(fqcn)
-            self.identity_map[fqcn] = cls(**settings) if settings else cls()
-
-        return self.identity_map[fqcn]
\ No newline at end of file
+            self.identity_map[fqcn] = self.create(fqcn)
+
+        return self.identity_map[fqcn]
+
+    def create(self, fqcn, **kwargs):
+        """
+        Create a new, unshared instance of a service by its fully-qualified
+        class name (fqcn), overriding its configured settings with ``kwargs``
+
+        :param fqcn: The fully-qualified class name of the service
+        :type fqcn: :class:`str`
+
+        :rtype: :class:`object`
+        """
+        assert isinstance(fqcn, (str, unicode))
+        class_name = fqcn.split(".")[-1]
+        module_name = ".".join(fqcn.split(".")[0:-1])
+        mdl = __import__(module_name, globals(), locals(), [class_name], 0)
+        if class_name not in dir(mdl):
+            raise ServiceNotFoundError("Could not locate %s" % fqcn)
+        cls = getattr(mdl, class_name)
+        settings = dict(self.settings.get(fqcn) or {}, **kwargs)
+        return cls(**settings)
\ No newline at end of file
@@ -2,7 +2,6 @@ import uuid
 from example import locators as l
 
 import recall.models as m
-import recall.event_handler as eh
 
 
 class CompanyFounded(m.Event):
@@ -11,13 +10,6 @@ class CompanyFounded(m.Event):
         assert isinstance(name, str)
 
 
-class WhenCompanyFounded(eh.DomainEventHandler):
-    def __call__(self, event):
-        assert isinstance(event, CompanyFounded)
-        self.entity.guid = event['guid']
-        self.entity.name = event['name']
-
-
 class EmployeeHired(m.Event):
     def require(self, guid, employee_guid, name, title):
         assert isinstance(guid, uuid.UUID)
@@ -26,28 +18,12 @@ class EmployeeHired(m.Event):
         assert isinstance(title, str)
 
 
-class WhenEmployeeHired(eh.DomainEventHandler):
-    def __call__(self, event):
-        assert isinstance(event, EmployeeHired)
-        employee = Employee(
-            event['employee_guid'],
-            event['name'],
-            event['title'])
-        self.entity.employees.add(employee)
-
-
 class EmployeePromoted(m.Event):
     def require(self, guid, title):
         assert isinstance(guid, uuid.UUID)
         assert isinstance(title, str)
 
 
-class WhenEmployeePromoted(eh.DomainEventHandler):
-    def __call__(self, event):
-        assert isinstance(event, EmployeePromoted)
-        self.entity.title = event['title']
-
-
 class FoundCompany(m.Command):
     def require(self, name):
         assert isinstance(name, str)
@@ -69,7 +45,6 @@ class Company(m.AggregateRoot):
         super(Company, self).__init__()
         self.name = None
         self.employees = m.EntityList()
-        self._register_handlers()
 
     def found(self, command):
         assert isinstance(command, FoundCompany)
@@ -95,9 +70,18 @@ class Company(m.AggregateRoot):
     def is_founded(self):
         return bool(self.guid)
 
-    def _register_handlers(self):
-        self._register_event_handler(CompanyFounded, WhenCompanyFounded)
-        self._register_event_handler(EmployeeHired, WhenEmployeeHired)
+    @m.handles(CompanyFounded)
+    def _when_company_founded(self, event):
+        self.guid = event['guid']
+        self.name = event['name']
+
+    @m.handles(EmployeeHired)
+    def _when_employee_hired(self, event):
+        employee = Employee(
+            event['employee_guid'],
+            event['name'],
+            event['title'])
+        self.employees.add(employee)
 
 
 class Employee(m.Entity):
@@ -106,7 +90,6 @@ class Employee(m.Entity):
         self.guid = guid
         self.name = name
         self.title = title
-        self._register_handlers()
 
     def promote(self, command):
         assert isinstance(command, PromoteEmployee)
@@ -114,8 +97,9 @@ class Employee(m.Entity):
         if title:
             self._apply_event(EmployeePromoted(guid=self.guid, title=title))
 
-    def _register_handlers(self):
-        self._register_event_handler(EmployeePromoted, WhenEmployeePromoted)
+    @m.handles(EmployeePromoted)
+    def _when_employee_promoted(self, event):
+        self.title = event['title']
 
 
 def main():
@@ -1,10 +1,27 @@
 import abc
 import datetime
+import itertools
+import struct
 import uuid
 
+import models
+
 
 class EventMarshaler(object):
+    """
+    The Event Marshaler interface
+
+    Marshalers whose output is already a serialized :class:`str` (rather than
+    a structure of built-in types) set ``binary``, so that event stores can
+    persist it as-is.
+
+    Marshalers which are ``trusted`` rebuild events without calling their
+    ``require`` method, since stored events were validated when they were
+    first applied. Only use it for data written by this application.
+    """
     __metaclass__ = abc.ABCMeta
+    binary = False
+    trusted = False
 
     @abc.abstractmethod
     def marshal(self, event):
@@ -16,8 +33,126 @@ class EventMarshaler(object):
         """
         pass
 
+    @abc.abstractmethod
+    def unmarshal(self, marshaled):
+        """
+        Unmarshal a structure of built-in types to a domain event
+
+        :param marshaled: A domain event marshaled to builtin types
+        :type marshaled: :class:`object`
+        """
+        pass
+
+    def unmarshal_many(self, records):
+        """
+        Unmarshal many marshaled domain events, in order
+
+        :param records: The domain events marshaled to builtin types
+        :type records: :class:`collections.Iterable`
+
+        :rtype: :class:`iterator`
+        """
+        return (self.unmarshal(marshaled) for marshaled in records)
+
+    def _create_event(self, cls, data):
+        """
+        Create a domain event from its unmarshaled data, validated unless the
+        marshaler is trusted
+
+        :param cls: The event class
+        :type cls: :class:`type`
+
+        :param data: The event data
+        :type data: :class:`dict`
+
+        :rtype: :class:`recall.models.Event`
+        """
+        if self.trusted:
+            return cls._restore(data)
+        return cls(**data)
+
 
 class DefaultEventMarshaler(EventMarshaler):
+    """
+    Marshals domain events to :class:`dict` structures of built-in types,
+    tagged with the fully-qualified class name (fqcn) of the event.
+
+    Event classes are resolved once per fqcn and cached in a registry (which
+    may also be filled up front with :meth:`register`), and values are
+    converted by dispatching on their exact type, falling back to
+    :func:`isinstance` checks only for types without a registered converter.
+
+    :param trusted: Whether to rebuild events without validating them
+    :type trusted: :class:`bool`
+    """
+    SCALAR_TYPES = frozenset([
+        type(None), bool, int, long, float, str, unicode])
+
+    def __init__(self, trusted=False):
+        assert isinstance(trusted, bool)
+        self.trusted = trusted
+        self._classes = {}
+        self._fqcns = {}
+        self._encoders = {
+            dict: self._encode_dict,
+            models.FrozenDict: self._encode_dict,
+            list: self._encode_list,
+            tuple: self._encode_list,
+            datetime.datetime: self._encode_datetime,
+            datetime.date: self._encode_datetime,
+            uuid.UUID: self._encode_uuid}
+        self._decoders = {
+            dict: self._decode_dict,
+            list: self._decode_list,
+            tuple: self._decode_list}
+
+    def register(self, cls):
+        """
+        Register an event class, so that it is never looked up by its fqcn
+
+        :param cls: The event class
+        :type cls: :class:`type`
+        """
+        assert isinstance(cls, type)
+        fqcn = ".".join([cls.__module__, cls.__name__])
+        self._fqcns[cls] = fqcn
+        self._classes[fqcn] = cls
+
+    def _get_class(self, fqcn):
+        """
+        Get an event class by its fqcn, importing it the first time only
+
+        :param fqcn: The fully-qualified class name of the event
+        :type fqcn: :class:`str`
+
+        :rtype: :class:`type`
+        """
+        cls = self._classes.get(fqcn)
+        if cls is None:
+            class_name = fqcn.split(".")[-1]
+            module_name = ".".join(fqcn.split(".")[0:-1])
+            mdl = __import__(module_name, globals(), locals(), [class_name], 0)
+            if class_name not in dir(mdl):
+                raise NameError("Could not instantiate %s" % fqcn)
+            cls = getattr(mdl, class_name)
+            self.register(cls)
+        return cls
+
+    def _get_fqcn(self, cls):
+        """
+        Get the fqcn of an event class
+
+        :param cls: The event class
+        :type cls: :class:`type`
+
+        :rtype: :class:`str`
+        """
+        fqcn = self._fqcns.get(cls)
+        if fqcn is None:
+            self.register(cls)
+            fqcn = self._fqcns[cls]
+        return fqcn
+
     def _to_builtin(self, obj):
         """
         Convert an object to a type consisting of only built-in types
@@ -27,14 +162,20 @@ class DefaultEventMarshaler(EventMarshaler):
 
         :rtype: :class:`object`
         """
+        obj_type = type(obj)
+        if obj_type in self.SCALAR_TYPES:
+            return obj
+        encoder = self._encoders.get(obj_type)
+        if encoder:
+            return encoder(obj)
         if isinstance(obj, dict):
-            return {k: self._to_builtin(v) for k, v in obj.items()}
+            return self._encode_dict(obj)
         if isinstance(obj, (list, tuple)):
-            return (self._to_builtin(v) for v in obj)
+            return self._encode_list(obj)
         if isinstance(obj, (datetime.datetime, datetime.date)):
-            return {"__datetime__": True, "datetime": obj.isoformat()}
+            return self._encode_datetime(obj)
         if isinstance(obj, uuid.UUID):
-            return {"__uuid__": True, "uuid": str(obj)}
+            return self._encode_uuid(obj)
         return obj
 
     def _from_builtin(self, obj):
@@ -46,17 +187,105 @@ class DefaultEventMarshaler(EventMarshaler):
 
         :rtype: :class:`object`
         """
-        if isinstance(obj, dict) and "__datetime__" in obj:
-            return datetime.datetime.strptime(
-                obj["datetime"],
-                "%Y-%m-%dT%H:%M:%S.%f")
-        if isinstance(obj, dict) and "__uuid__" in obj:
-            return uuid.UUID("urn:uuid:%s" % obj["uuid"])
-        if isinstance(obj, dict):
-            return {k: self._from_builtin(v) for k, v in obj.items()}
-        if isinstance(obj, (list, tuple)):
-            return (self._from_builtin(v) for v in obj)
-        return obj
+        decoder = self._decoders.get(type(obj))
+        return decoder(obj) if decoder else obj
+
+    def _encode_dict(self, obj):
+        """
+        Convert a :class:`dict` to built-in types
+
+        :param obj: The object to convert
+        :type obj: :class:`object`
+
+        :rtype: :class:`object`
+        """
+        return dict((k, self._to_builtin(v)) for k, v in obj.iteritems())
+
+    def _encode_list(self, obj):
+        """
+        Convert a :class:`list` or :class:`tuple` to built-in types
+
+        :param obj: The object to convert
+        :type obj: :class:`object`
+
+        :rtype: :class:`object`
+        """
+        return [self._to_builtin(v) for v in obj]
+
+    def _encode_datetime(self, obj):
+        """
+        Convert a :class:`datetime.datetime` or :class:`datetime.date` to
+        built-in types
+
+        :param obj: The object to convert
+        :type obj: :class:`object`
+
+        Datetimes are always written with microseconds, so that they can be
+        parsed with a single format, and dates as ``YYYY-MM-DD``.
+
+        :rtype: :class:`object`
+        """
+        if isinstance(obj, datetime.datetime):
+            value = "%s.%06d" % (
+                obj.replace(microsecond=0).isoformat(), obj.microsecond)
+        else:
+            value = obj.isoformat()
+        return {"__datetime__": True, "datetime": value}
+
+    def _encode_uuid(self, obj):
+        """
+        Convert a :class:`uuid.UUID` to built-in types
+
+        :param obj: The object to convert
+        :type obj: :class:`object`
+
+        :rtype: :class:`object`
+        """
+        return {"__uuid__": True, "uuid": str(obj)}
+
+    def _decode_dict(self, obj):
+        """
+        Convert a :class:`dict` of built-in types, which may represent a
+        :class:`datetime.datetime` or :class:`uuid.UUID`
+
+        :param obj: The object to convert
+        :type obj: :class:`object`
+
+        :rtype: :class:`object`
+        """
+        if "__datetime__" in obj:
+            return self._decode_datetime(obj["datetime"])
+        if "__uuid__" in obj:
+            return uuid.UUID(obj["uuid"])
+        return dict((k, self._from_builtin(v)) for k, v in obj.iteritems())
+
+    def _decode_datetime(self, value):
+        """
+        Convert an ISO 8601 :class:`str` to a :class:`datetime.date`, or to a
+        :class:`datetime.datetime` with or without microseconds (as written by
+        :meth:`datetime.datetime.isoformat`)
+
+        :param value: The value to convert
+        :type value: :class:`str`
+
+        :rtype: :class:`datetime.date`
+        """
+        if "T" not in value:
+            return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+        if "." not in value:
+            return datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+        return datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f")
+
+    def _decode_list(self, obj):
+        """
+        Convert a :class:`list` of built-in types
+
+        :param obj: The object to convert
+        :type obj: :class:`object`
+
+        :rtype: :class:`object`
+        """
+        return [self._from_builtin(v) for v in obj]
 
     def marshal(self, event):
         """
@@ -66,8 +295,8 @@ class DefaultEventMarshaler(EventMarshaler):
         :type event: :class:`recall.models.Event`
         """
         return {
-            "__type__": ".".join([event.__module__, event.__class__.__name__]),
-            "data": self._to_builtin(event._data)}
+            "__type__": self._get_fqcn(event.__class__),
+            "data": self._encode_dict(event._data)}
 
     def unmarshal(self, marshaled):
         """
@@ -76,11 +305,672 @@ class DefaultEventMarshaler(EventMarshaler):
         :param marshaled: A domain event marshaled to builtin types
         :type marshaled: :class:`object`
         """
-        fqcn = marshaled["__type__"]
-        class_name = fqcn.split(".")[-1]
-        module_name = ".".join(fqcn.split(".")[0:-1])
-        mdl = __import__(module_name, globals(), locals(), [class_name], 0)
-        if class_name not in dir(mdl):
-            raise NameError("Could not instantiate %s" % fqcn)
-        cls = getattr(mdl, class_name)
-        return cls(**self._from_builtin(marshaled["data"]))
+        cls = self._get_class(marshaled["__type__"])
+        return self._create_event(cls, self._decode_dict(marshaled["data"]))
+
+    def unmarshal_many(self, records):
+        """
+        Unmarshal many marshaled domain events, in order.
+
+        Consecutive records of the same type (and number of fields) are
+        decoded together: the event class is resolved once per run, and each
+        field is decoded column-wise, so that e.g. a column of UUIDs is
+        converted in a single pass.
+
+        :param records: The domain events marshaled to builtin types
+        :type records: :class:`collections.Iterable`
+
+        :rtype: :class:`iterator`
+        """
+        runs = itertools.groupby(
+            records,
+            lambda x: (x["__type__"], len(x["data"])))
+        for (fqcn, _), run in runs:
+            cls = self._get_class(fqcn)
+            rows = [marshaled["data"] for marshaled in run]
+            keys = rows[0].keys()
+            try:
+                columns = [
+                    self._decode_column([row[key] for row in rows])
+                    for key in keys]
+            except KeyError:
+                for row in rows:
+                    yield self._create_event(cls, self._decode_dict(row))
+                continue
+
+            for values in itertools.izip(*columns):
+                yield self._create_event(
+                    cls, dict(itertools.izip(keys, values)))
+
+    def _decode_column(self, column):
+        """
+        Convert a column of values of built-in types, i.e. the values of one
+        field across a run of events.
+
+        :param column: The values to convert
+        :type column: :class:`list`
+
+        :rtype: :class:`list`
+        """
+        types = set(type(value) for value in column)
+        if types <= self.SCALAR_TYPES:
+            return column
+        if types == set([dict]):
+            if all("__uuid__" in value for value in column):
+                return [uuid.UUID(value["uuid"]) for value in column]
+            if all("__datetime__" in value for value in column):
+                return [
+                    self._decode_datetime(value["datetime"])
+                    for value in column]
+        return [self._from_builtin(value) for value in column]
+
+
+class BinaryEventMarshaler(EventMarshaler):
+    """
+    Marshals domain events to a compact binary :class:`str`.
+
+    Instead of its fqcn, each event class is identified by a small integer id,
+    registered up front (see :meth:`register`). Values are written as a one
+    byte tag followed by their data, with UUIDs stored as 16 raw bytes and
+    datetimes as integer microseconds since the epoch. It supports the same
+    values as :class:`DefaultEventMarshaler`, and unmarshals them to the same
+    types (i.e. tuples become lists). Datetimes must be naive.
+
+    :param types: The event classes, by id
+    :type types: :class:`dict`
+
+    :param trusted: Whether to rebuild events without validating them
+    :type trusted: :class:`bool`
+    """
+    binary = True
+    EPOCH = datetime.datetime(1970, 1, 1)
+    TYPE_ID = struct.Struct(">H")
+    LENGTH = struct.Struct(">I")
+    INT = struct.Struct(">q")
+    FLOAT = struct.Struct(">d")
+    DATE = struct.Struct(">i")
+    SHORT_LENGTH_LIMIT = 0xff
+
+    def __init__(self, types=None, trusted=False):
+        assert isinstance(types, dict) or types is None
+        assert isinstance(trusted, bool)
+        self.trusted = trusted
+        self._classes = {}
+        self._type_ids = {}
+        for type_id, cls in (types or {}).items():
+            self.register(cls, type_id)
+
+        self._writers = {
+            type(None): self._write_none,
+            bool: self._write_bool,
+            int: self._write_int,
+            long: self._write_long,
+            float: self._write_float,
+            str: self._write_str,
+            unicode: self._write_unicode,
+            list: self._write_list,
+            tuple: self._write_list,
+            dict: self._write_dict,
+            models.FrozenDict: self._write_dict,
+            datetime.datetime: self._write_datetime,
+            datetime.date: self._write_date,
+            uuid.UUID: self._write_uuid}
+        self._readers = {
+            "N": self._read_none,
+            "T": self._read_true,
+            "F": self._read_false,
+            "b": self._read_byte,
+            "i": self._read_int,
+            "l": self._read_long,
+            "f": self._read_float,
+            "s": self._read_str,
+            "u": self._read_unicode,
+            "[": self._read_list,
+            "{": self._read_dict,
+            "D": self._read_datetime,
+            "d": self._read_date,
+            "U": self._read_uuid}
+
+    def register(self, cls, type_id):
+        """
+        Register an event class under an id
+
+        :param cls: The event class
+        :type cls: :class:`type`
+
+        :param type_id: The id of the event class
+        :type type_id: :class:`int`
+        """
+        assert isinstance(cls, type)
+        assert isinstance(type_id, int) and 0 <= type_id <= 0xffff
+        assert self._classes.get(type_id, cls) is cls
+        self._classes[type_id] = cls
+        self._type_ids[cls] = type_id
+
+    def marshal(self, event):
+        """
+        Marshal a domain event to a binary string
+
+        :param event: The domain event
+        :type event: :class:`recall.models.Event`
+
+        :rtype: :class:`str`
+        """
+        type_id = self._type_ids.get(event.__class__)
+        if type_id is None:
+            raise NameError(
+                "Could not marshal unregistered %s" % event.__class__)
+        chunks = [self.TYPE_ID.pack(type_id)]
+        self._write_dict(event._data, chunks)
+        return "".join(chunks)
+
+    def unmarshal(self, marshaled):
+        """
+        Unmarshal a binary string to a domain event
+
+        :param marshaled: A domain event marshaled to a binary string
+        :type marshaled: :class:`str`
+
+        :rtype: :class:`recall.models.Event`
+        """
+        type_id, = self.TYPE_ID.unpack_from(marshaled, 0)
+        cls = self._classes.get(type_id)
+        if cls is None:
+            raise NameError("Could not instantiate type %d" % type_id)
+        data, _ = self._read(marshaled, self.TYPE_ID.size)
+        return self._create_event(cls, data)
+
+    def dumps(self, obj):
+        """
+        Marshal a structure of supported values to a binary string
+
+        :param obj: The structure
+        :type obj: :class:`object`
+
+        :rtype: :class:`str`
+        """
+        chunks = []
+        self._write(obj, chunks)
+        return "".join(chunks)
+
+    def loads(self, data):
+        """
+        Unmarshal a binary string written by :meth:`dumps`
+
+        :param data: The binary string
+        :type data: :class:`str`
+
+        :rtype: :class:`object`
+        """
+        return self._read(data, 0)[0]
+
+    def _write(self, obj, chunks):
+        """
+        Write a tagged value
+
+        :param obj: The value
+        :type obj: :class:`object`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        writer = self._writers.get(type(obj))
+        if writer is None:
+            raise TypeError("Could not marshal %r" % (obj,))
+        writer(obj, chunks)
+
+    def _write_length(self, length, chunks):
+        """
+        Write a length, in one byte if it is short enough
+
+        :param length: The length
+        :type length: :class:`int`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        if length < self.SHORT_LENGTH_LIMIT:
+            chunks.append(chr(length))
+        else:
+            chunks.append(chr(self.SHORT_LENGTH_LIMIT))
+            chunks.append(self.LENGTH.pack(length))
+
+    def _write_none(self, obj, chunks):
+        """
+        Write ``None``
+
+        :param obj: The value
+        :type obj: :class:`NoneType`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("N")
+
+    def _write_bool(self, obj, chunks):
+        """
+        Write a boolean
+
+        :param obj: The value
+        :type obj: :class:`bool`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("T" if obj else "F")
+
+    def _write_int(self, obj, chunks):
+        """
+        Write an integer, in one byte if it is small enough
+
+        :param obj: The value
+        :type obj: :class:`int`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        if 0 <= obj <= 0xff:
+            chunks.append("b")
+            chunks.append(chr(obj))
+        else:
+            chunks.append("i")
+            chunks.append(self.INT.pack(obj))
+
+    def _write_long(self, obj, chunks):
+        """
+        Write a long integer, as its decimal string
+
+        :param obj: The value
+        :type obj: :class:`long`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("l")
+        self._write_bytes(str(obj), chunks)
+
+    def _write_float(self, obj, chunks):
+        """
+        Write a float
+
+        :param obj: The value
+        :type obj: :class:`float`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("f")
+        chunks.append(self.FLOAT.pack(obj))
+
+    def _write_str(self, obj, chunks):
+        """
+        Write a byte string
+
+        :param obj: The value
+        :type obj: :class:`str`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("s")
+        self._write_bytes(obj, chunks)
+
+    def _write_unicode(self, obj, chunks):
+        """
+        Write a unicode string, encoded to UTF-8
+
+        :param obj: The value
+        :type obj: :class:`unicode`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("u")
+        self._write_bytes(obj.encode("utf-8"), chunks)
+
+    def _write_bytes(self, obj, chunks):
+        """
+        Write a length-prefixed byte string, without a tag
+
+        :param obj: The value
+        :type obj: :class:`str`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        self._write_length(len(obj), chunks)
+        chunks.append(obj)
+
+    def _write_list(self, obj, chunks):
+        """
+        Write a list or tuple
+
+        :param obj: The value
+        :type obj: :class:`list`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("[")
+        self._write_length(len(obj), chunks)
+        for value in obj:
+            self._write(value, chunks)
+
+    def _write_dict(self, obj, chunks):
+        """
+        Write a dict
+
+        :param obj: The value
+        :type obj: :class:`dict`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("{")
+        self._write_length(len(obj), chunks)
+        for key, value in obj.iteritems():
+            self._write(key, chunks)
+            self._write(value, chunks)
+
+    def _write_datetime(self, obj, chunks):
+        """
+        Write a naive datetime, as microseconds since the epoch
+
+        :param obj: The value
+        :type obj: :class:`datetime.datetime`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        assert obj.tzinfo is None
+        delta = obj - self.EPOCH
+        chunks.append("D")
+        chunks.append(self.INT.pack(
+            (delta.days * 86400 + delta.seconds) * 1000000
+            + delta.microseconds))
+
+    def _write_date(self, obj, chunks):
+        """
+        Write a date, as its ordinal
+
+        :param obj: The value
+        :type obj: :class:`datetime.date`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("d")
+        chunks.append(self.DATE.pack(obj.toordinal()))
+
+    def _write_uuid(self, obj, chunks):
+        """
+        Write a UUID, as its 16 bytes
+
+        :param obj: The value
+        :type obj: :class:`uuid.UUID`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("U")
+        chunks.append(obj.bytes)
+
+    def _read(self, data, offset):
+        """
+        Read a tagged value
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value's tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        return self._readers[data[offset]](data, offset + 1)
+
+    def _read_length(self, data, offset):
+        """
+        Read a length written by :meth:`_write_length`
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the length
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the length and the offset following it
+        """
+        length = ord(data[offset])
+        if length < self.SHORT_LENGTH_LIMIT:
+            return length, offset + 1
+        length, = self.LENGTH.unpack_from(data, offset + 1)
+        return length, offset + 1 + self.LENGTH.size
+
+    def _read_none(self, data, offset):
+        """
+        Read ``None``
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        return None, offset
+
+    def _read_true(self, data, offset):
+        """
+        Read ``True``
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        return True, offset
+
+    def _read_false(self, data, offset):
+        """
+        Read ``False``
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        return False, offset
+
+    def _read_byte(self, data, offset):
+        """
+        Read an integer written in one byte
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        return ord(data[offset]), offset + 1
+
+    def _read_int(self, data, offset):
+        """
+        Read an integer
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        return self.INT.unpack_from(data, offset)[0], offset + self.INT.size
+
+    def _read_long(self, data, offset):
+        """
+        Read a long integer
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        value, offset = self._read_bytes(data, offset)
+        return long(value), offset
+
+    def _read_float(self, data, offset):
+        """
+        Read a float
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        return (self.FLOAT.unpack_from(data, offset)[0],
+                offset + self.FLOAT.size)
+
+    def _read_str(self, data, offset):
+        """
+        Read a byte string
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        return self._read_bytes(data, offset)
+
+    def _read_unicode(self, data, offset):
+        """
+        Read a unicode string
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        value, offset = self._read_bytes(data, offset)
+        return value.decode("utf-8"), offset
+
+    def _read_bytes(self, data, offset):
+        """
+        Read a length-prefixed byte string, without a tag
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the length prefix
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        length, offset = self._read_length(data, offset)
+        return data[offset:offset + length], offset + length
+
+    def _read_list(self, data, offset):
+        """
+        Read a list
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        length, offset = self._read_length(data, offset)
+        values = []
+        for _ in xrange(length):
+            value, offset = self._read(data, offset)
+            values.append(value)
+        return values, offset
+
+    def _read_dict(self, data, offset):
+        """
+        Read a dict
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        length, offset = self._read_length(data, offset)
+        values = {}
+        for _ in xrange(length):
+            key, offset = self._read(data, offset)
+            values[key], offset = self._read(data, offset)
+        return values, offset
+
+    def _read_datetime(self, data, offset):
+        """
+        Read a datetime
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        micros, = self.INT.unpack_from(data, offset)
+        return (self.EPOCH + datetime.timedelta(microseconds=micros),
+                offset + self.INT.size)
+
+    def _read_date(self, data, offset):
+        """
+        Read a date
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        ordinal, = self.DATE.unpack_from(data, offset)
+        return (datetime.date.fromordinal(ordinal),
+                offset + self.DATE.size)
+
+    def _read_uuid(self, data, offset):
+        """
+        Read a UUID
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        return uuid.UUID(bytes=data[offset:offset + 16]), offset + 16
@@ -1,5 +1,18 @@
 import abc
+import collections
+import itertools
+import logging
+import os
+import pickle
+import Queue
+import shutil
+import struct
+import threading
+import time
+import uuid
 
+import recall.event_marshaler
+import recall.event_store
 import recall.models
 
 
@@ -22,6 +35,31 @@ class EventRouter(object):
         """
         pass
 
+    def route_all(self, guid, events):
+        """
+        Route the events saved with an aggregate root, in order
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :param events: The domain events
+        :type events: :class:`list`
+        """
+        for event in events:
+            self.route(event)
+
+    def flush(self):
+        """
+        Wait for any events routed in the background to be delivered
+        """
+        pass
+
+    def close(self):
+        """
+        Deliver any events routed in the background, and stop routing
+        """
+        pass
+
 
 class StdOut(EventRouter):
     """
@@ -35,4 +73,720 @@ class StdOut(EventRouter):
         :type event: :class:`recall.models.Event`
         """
         assert isinstance(event, recall.models.Event)
-        print("[x] Routed event %s" % event.__class__.__name__)
\ No newline at end of file
+        print("[x] Routed event %s" % event.__class__.__name__)
+
+
+class Batching(EventRouter):
+    """
+    Route events to subscribers from a background thread, in batches.
+
+    Routing an event only queues it, so saving an aggregate root doesn't wait
+    for subscribers. The thread delivers the queued events, in order, to each
+    subscriber as lists of up to ``batch_size`` events. The queue is bounded:
+    once ``backlog`` events are queued, routing blocks until there is room
+    again (or raises :class:`Queue.Full` after ``timeout`` seconds), which
+    slows writers down to the pace of the subscribers.
+
+    A subscriber which raises is logged, and the batch is not retried. Call
+    :meth:`flush` to wait for queued events to be delivered, and :meth:`close`
+    on shutdown.
+
+    :param subscribers: The callables receiving lists of events
+    :type subscribers: :class:`list`
+
+    :param batch_size: The maximum number of events per batch
+    :type batch_size: :class:`int`
+
+    :param backlog: The maximum number of queued events
+    :type backlog: :class:`int`
+
+    :param timeout: The time (in seconds) to wait for room in the queue, or
+        None to wait for as long as it takes
+    :type timeout: :class:`float`
+    """
+    def __init__(self, subscribers=None, batch_size=100, backlog=10000,
+                 timeout=None):
+        assert isinstance(subscribers, list) or subscribers is None
+        assert isinstance(batch_size, int) and batch_size > 0
+        assert isinstance(backlog, int) and backlog > 0
+        assert isinstance(timeout, (int, float)) or timeout is None
+        self.subscribers = list(subscribers or [])
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._queue = Queue.Queue(backlog)
+        self._thread = threading.Thread(target=self._work)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def subscribe(self, subscriber):
+        """
+        Add a subscriber
+
+        :param subscriber: A callable receiving lists of events
+        :type subscriber: :class:`collections.Callable`
+        """
+        assert isinstance(subscriber, collections.Callable)
+        self.subscribers.append(subscriber)
+
+    def route(self, event):
+        """
+        Queue an event for delivery
+
+        :param event: The domain event
+        :type event: :class:`recall.models.Event`
+
+        :raises: :class:`Queue.Full`
+        """
+        assert isinstance(event, recall.models.Event)
+        self._queue.put(event, timeout=self.timeout)
+
+    def route_all(self, guid, events):
+        """
+        Queue the events saved with an aggregate root for delivery
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :param events: The domain events
+        :type events: :class:`list`
+
+        :raises: :class:`Queue.Full`
+        """
+        assert isinstance(guid, uuid.UUID)
+        for event in events:
+            self.route(event)
+
+    def flush(self):
+        """
+        Wait for all queued events to be delivered
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Deliver all queued events and stop the thread
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _work(self):
+        """
+        Deliver queued events until closed
+        """
+        while True:
+            batch = [self._queue.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Queue.Empty:
+                    break
+
+            events = [x for x in batch if x is not None]
+            try:
+                if events:
+                    self._deliver(events)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def _deliver(self, events):
+        """
+        Deliver a batch of events to every subscriber
+
+        :param events: The domain events
+        :type events: :class:`list`
+        """
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber(events)
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    "Could not deliver %d events to %r",
+                    len(events), subscriber)
+
+
+class FanOut(EventRouter):
+    """
+    Route events to the subscribers of their class, from a pool of threads
+    partitioned by aggregate root.
+
+    The events saved with an aggregate root are queued on the partition its
+    guid hashes to, and each partition is served by a single thread, so the
+    events of an aggregate are delivered in order while different aggregates
+    are delivered in parallel. Events routed on their own are partitioned by
+    their ``guid`` field, if any. Each subscriber is a callable receiving one
+    event, registered for an event class (and its subclasses).
+
+    The lag of each partition, i.e. the number of routed events it has yet to
+    deliver and the age (in seconds) of the oldest of them, is reported by
+    :meth:`get_lag`, so a slow or stuck subscriber shows up as growing lag on
+    the partitions it holds up. As with :class:`Batching`, the partition
+    queues are bounded by ``backlog`` and failing subscribers are logged.
+
+    :param partitions: The number of partitions (and threads)
+    :type partitions: :class:`int`
+
+    :param backlog: The maximum number of queued batches per partition
+    :type backlog: :class:`int`
+    """
+    def __init__(self, partitions=4, backlog=1000):
+        assert isinstance(partitions, int) and partitions > 0
+        assert isinstance(backlog, int) and backlog > 0
+        self._subscriptions = []
+        self._resolved = {}
+        self._queues = [Queue.Queue(backlog) for _ in range(partitions)]
+        self._pending = [collections.OrderedDict() for _ in range(partitions)]
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, args=(x,))
+            for x in range(partitions)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def subscribe(self, event_cls, subscriber):
+        """
+        Add a subscriber to an event class
+
+        :param event_cls: The event type
+        :type event_cls: :class:`type`
+
+        :param subscriber: A callable receiving events
+        :type subscriber: :class:`collections.Callable`
+        """
+        assert isinstance(event_cls, type)
+        assert isinstance(subscriber, collections.Callable)
+        self._subscriptions.append((event_cls, subscriber))
+        self._resolved = {}
+
+    def get_lag(self):
+        """
+        Get the lag of each partition, as ``(events, seconds)`` tuples of the
+        number of undelivered events (queued or being delivered) and the time
+        since the oldest of them was routed, or 0.0 if there are none
+
+        :rtype: :class:`list`
+        """
+        now = time.time()
+        lag = []
+        with self._lock:
+            for pending in self._pending:
+                batches = pending.values()
+                lag.append((
+                    sum(count for _, count in batches),
+                    now - batches[0][0] if batches else 0.0))
+        return lag
+
+    def route(self, event):
+        """
+        Queue an event for delivery, on the partition of its guid
+
+        :param event: The domain event
+        :type event: :class:`recall.models.Event`
+        """
+        assert isinstance(event, recall.models.Event)
+        self._put(event.get("guid"), [event])
+
+    def route_all(self, guid, events):
+        """
+        Queue the events saved with an aggregate root for delivery, on the
+        partition of the root
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :param events: The domain events
+        :type events: :class:`list`
+        """
+        assert isinstance(guid, uuid.UUID)
+        if events:
+            self._put(guid, list(events))
+
+    def flush(self):
+        """
+        Wait for all queued events to be delivered
+        """
+        for queue in self._queues:
+            queue.join()
+
+    def close(self):
+        """
+        Deliver all queued events and stop the threads
+        """
+        for queue, thread in zip(self._queues, self._threads):
+            if thread.is_alive():
+                queue.put(None)
+                thread.join()
+
+    def _put(self, guid, events):
+        """
+        Queue events on the partition of an aggregate root, and count them as
+        pending until they are delivered
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :param events: The domain events
+        :type events: :class:`list`
+        """
+        partition = hash(guid) % len(self._queues)
+        key = next(self._ids)
+        with self._lock:
+            self._pending[partition][key] = (time.time(), len(events))
+        self._queues[partition].put((key, events))
+
+    def _get_subscriptions(self, event_cls):
+        """
+        Get the subscriptions to an event class, including those to its bases
+
+        :param event_cls: The event type
+        :type event_cls: :class:`type`
+
+        :rtype: :class:`list`
+        """
+        subscriptions = self._resolved.get(event_cls)
+        if subscriptions is None:
+            subscriptions = self._resolved[event_cls] = [
+                x for x in self._subscriptions
+                if issubclass(event_cls, x[0])]
+        return subscriptions
+
+    def _work(self, partition):
+        """
+        Deliver the events queued on a partition until closed
+
+        :param partition: The number of the partition
+        :type partition: :class:`int`
+        """
+        queue = self._queues[partition]
+        while True:
+            item = queue.get()
+            try:
+                if item is None:
+                    return
+                key, events = item
+                try:
+                    for event in events:
+                        self._deliver(event)
+                finally:
+                    with self._lock:
+                        del self._pending[partition][key]
+            finally:
+                queue.task_done()
+
+    def _deliver(self, event):
+        """
+        Deliver an event to the subscribers of its class
+
+        :param event: The domain event
+        :type event: :class:`recall.models.Event`
+        """
+        for event_cls, subscriber in self._get_subscriptions(event.__class__):
+            try:
+                subscriber(event)
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    "Could not deliver %s to %r",
+                    event.__class__.__name__, subscriber)
+
+
+class Outbox(EventRouter):
+    """
+    Route events through a durable local spool, delivered to subscribers from
+    a background thread.
+
+    Routing appends the marshaled events to a spool file (as length-prefixed
+    records), so saving an aggregate root doesn't wait for subscribers, and
+    events which were routed are never lost: after a crash, delivery resumes
+    from the last checkpoint. The thread delivers the spooled events, in
+    order, to each subscriber as lists of up to ``batch_size`` events, and
+    only then moves the checkpoint past them. If a subscriber raises, the
+    batch is retried after ``retry_interval`` seconds, so delivery is
+    at-least-once: subscribers may see a batch again, and should be
+    idempotent. Once everything is delivered, the spool is emptied; and once
+    at least ``compact_size`` bytes (and half the spool) have been delivered,
+    the undelivered rest is copied to a new spool, so that the spool doesn't
+    grow without bound under a steady load.
+
+    Spooled events are only safe once they are routed, i.e. after the
+    repository has stored them. Given an ``event_store``, the outbox instead
+    delivers the events of the store's global log (see
+    :meth:`recall.event_store.EventStore.read_all`), and the checkpoint holds
+    the position of the last delivered event. Then every stored event is
+    delivered, even if the process died before routing it: routing only wakes
+    the thread, which also polls the log every ``retry_interval`` seconds for
+    events saved elsewhere.
+
+    Call :meth:`flush` to wait for routed events to be delivered, and
+    :meth:`close` on shutdown; events left undelivered stay in the spool (or
+    the event store).
+
+    :param path: The directory holding the spool and checkpoint files
+    :type path: :class:`str`
+
+    :param subscribers: The callables receiving lists of events
+    :type subscribers: :class:`list`
+
+    :param marshaler: The event marshaler
+    :type marshaler: :class:`recall.event_marshaler.EventMarshaler`
+
+    :param batch_size: The maximum number of events per batch
+    :type batch_size: :class:`int`
+
+    :param fsync: Whether to fsync the spool and checkpoint files on writes
+    :type fsync: :class:`bool`
+
+    :param retry_interval: The time (in seconds) to wait before retrying a
+        failed batch
+    :type retry_interval: :class:`float`
+
+    :param compact_size: The number of delivered bytes after which the spool
+        is compacted
+    :type compact_size: :class:`int`
+
+    :param event_store: The event store to deliver from, instead of a spool
+    :type event_store: :class:`recall.event_store.EventStore`
+    """
+    SPOOL_NAME = "spool"
+    CHECKPOINT_NAME = "checkpoint"
+    RECORD_HEADER = struct.Struct(">I")
+    CHECKPOINT = struct.Struct(">Q")
+    DEFAULT_COMPACT_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, path, subscribers=None, marshaler=None, batch_size=100,
+                 fsync=False, retry_interval=1.0, compact_size=None,
+                 event_store=None):
+        assert isinstance(path, (str, unicode))
+        assert isinstance(subscribers, list) or subscribers is None
+        assert (isinstance(marshaler, recall.event_marshaler.EventMarshaler)
+                or marshaler is None)
+        assert isinstance(batch_size, int) and batch_size > 0
+        assert isinstance(retry_interval, (int, float))
+        assert isinstance(compact_size, int) or compact_size is None
+        assert (isinstance(event_store, recall.event_store.EventStore)
+                or event_store is None)
+        self.path = path
+        self.subscribers = list(subscribers or [])
+        self.marshaler = (
+            marshaler or recall.event_marshaler.DefaultEventMarshaler())
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.retry_interval = retry_interval
+        self.compact_size = compact_size or self.DEFAULT_COMPACT_SIZE
+        self.event_store = event_store
+        self._condition = threading.Condition()
+        self._closed = False
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        if event_store is None:
+            self._spool = open(os.path.join(path, self.SPOOL_NAME), "a+b")
+            self._offset = self._read_checkpoint()
+            self._size = self._recover()
+            self._thread = threading.Thread(target=self._work)
+        else:
+            self._spool = None
+            self._position = self._read_checkpoint()
+            self._routed = 1
+            self._caught_up = 0
+            self._thread = threading.Thread(target=self._tail)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def subscribe(self, subscriber):
+        """
+        Add a subscriber
+
+        :param subscriber: A callable receiving lists of events
+        :type subscriber: :class:`collections.Callable`
+        """
+        assert isinstance(subscriber, collections.Callable)
+        self.subscribers.append(subscriber)
+
+    def route(self, event):
+        """
+        Spool an event for delivery (or, with an event store, wake the thread
+        to deliver the stored events)
+
+        :param event: The domain event
+        :type event: :class:`recall.models.Event`
+        """
+        assert isinstance(event, recall.models.Event)
+        self._append([event])
+
+    def route_all(self, guid, events):
+        """
+        Spool the events saved with an aggregate root for delivery, with a
+        single write
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :param events: The domain events
+        :type events: :class:`list`
+        """
+        assert isinstance(guid, uuid.UUID)
+        if events:
+            self._append(events)
+
+    def flush(self):
+        """
+        Wait for all routed events to be delivered
+        """
+        with self._condition:
+            if self.event_store is not None:
+                routed = self._routed
+                while self._caught_up < routed and self._thread.is_alive():
+                    self._condition.wait(self.retry_interval)
+                return
+            while self._offset < self._size and self._thread.is_alive():
+                self._condition.wait(self.retry_interval)
+
+    def close(self):
+        """
+        Stop the thread, once it is done with the batch it is delivering, and
+        close the spool
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        if self._spool:
+            self._spool.close()
+
+    def _append(self, events):
+        """
+        Append events to the spool (or, with an event store, wake the thread)
+
+        :param events: The domain events
+        :type events: :class:`list`
+        """
+        if self.event_store is not None:
+            with self._condition:
+                self._routed += 1
+                self._condition.notify_all()
+            return
+
+        chunks = []
+        for event in events:
+            payload = self.marshaler.marshal(event)
+            if not self.marshaler.binary:
+                payload = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+            chunks.append(self.RECORD_HEADER.pack(len(payload)))
+            chunks.append(payload)
+        data = "".join(chunks)
+
+        with self._condition:
+            self._spool.write(data)
+            self._sync(self._spool)
+            self._size += len(data)
+            self._condition.notify_all()
+
+    def _sync(self, fp):
+        """
+        Flush a file, and fsync it if configured
+
+        :param fp: The file
+        :type fp: :class:`file`
+        """
+        fp.flush()
+        if self.fsync:
+            os.fsync(fp.fileno())
+
+    def _read(self, offset, size):
+        """
+        Read up to ``batch_size`` spooled records
+
+        :param offset: The offset of the first record
+        :type offset: :class:`int`
+
+        :param size: The size of the spool
+        :type size: :class:`int`
+
+        :rtype: :class:`tuple` of the record payloads and the offset after
+            the last one
+        """
+        payloads = []
+        with open(self._spool.name, "rb") as fp:
+            fp.seek(offset)
+            while offset < size and len(payloads) < self.batch_size:
+                length, = self.RECORD_HEADER.unpack(
+                    fp.read(self.RECORD_HEADER.size))
+                payloads.append(fp.read(length))
+                offset += self.RECORD_HEADER.size + length
+        return payloads, offset
+
+    def _decode_many(self, payloads):
+        """
+        Decode spooled record payloads to domain events, in order
+
+        :param payloads: The record payloads
+        :type payloads: :class:`list`
+
+        :rtype: :class:`list`
+        """
+        if not self.marshaler.binary:
+            payloads = [pickle.loads(payload) for payload in payloads]
+        return list(self.marshaler.unmarshal_many(payloads))
+
+    def _read_checkpoint(self):
+        """
+        Read the offset of the first undelivered record
+
+        :rtype: :class:`int`
+        """
+        path = os.path.join(self.path, self.CHECKPOINT_NAME)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as fp:
+            data = fp.read()
+        if len(data) < self.CHECKPOINT.size:
+            return 0
+        return self.CHECKPOINT.unpack(data)[0]
+
+    def _write_checkpoint(self, offset):
+        """
+        Persist the offset of the first undelivered record. The checkpoint is
+        written to a temporary file and renamed into place, so it is never
+        partially written.
+
+        :param offset: The offset
+        :type offset: :class:`int`
+        """
+        path = os.path.join(self.path, self.CHECKPOINT_NAME)
+        with open(path + ".tmp", "wb") as fp:
+            fp.write(self.CHECKPOINT.pack(offset))
+            self._sync(fp)
+        os.rename(path + ".tmp", path)
+
+    def _recover(self):
+        """
+        Truncate any partially written trailing record of the spool (e.g.
+        after a crash during a write)
+
+        :rtype: :class:`int` the size of the spool
+        """
+        self._spool.seek(0, os.SEEK_END)
+        size = self._spool.tell()
+        offset = min(self._offset, size)
+        with open(self._spool.name, "rb") as fp:
+            fp.seek(offset)
+            data = fp.read()
+
+        position = 0
+        while position + self.RECORD_HEADER.size <= len(data):
+            length, = self.RECORD_HEADER.unpack_from(data, position)
+            end = position + self.RECORD_HEADER.size + length
+            if end > len(data):
+                break
+            position = end
+
+        if offset + position < size:
+            self._spool.truncate(offset + position)
+        self._offset = offset
+        return offset + position
+
+    def _work(self):
+        """
+        Deliver spooled events until closed
+        """
+        while True:
+            with self._condition:
+                while self._offset >= self._size and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                offset, size = self._offset, self._size
+
+            payloads, end = self._read(offset, size)
+            if not self._deliver(self._decode_many(payloads)):
+                with self._condition:
+                    if not self._closed:
+                        self._condition.wait(self.retry_interval)
+                continue
+
+            self._write_checkpoint(end)
+            with self._condition:
+                self._offset = end
+                if self._offset == self._size:
+                    self._write_checkpoint(0)
+                    self._spool.truncate(0)
+                    self._offset = self._size = 0
+                elif (self._offset >= self.compact_size
+                      and self._offset >= self._size - self._offset):
+                    self._compact()
+                self._condition.notify_all()
+
+    def _tail(self):
+        """
+        Deliver the events of the event store's global log until closed
+        """
+        while True:
+            with self._condition:
+                if self._caught_up == self._routed and not self._closed:
+                    self._condition.wait(self.retry_interval)
+                if self._closed:
+                    return
+                routed = self._routed
+
+            stored = self.event_store.read_all(
+                self._position, self.batch_size)
+            if not stored:
+                with self._condition:
+                    self._caught_up = max(self._caught_up, routed)
+                    self._condition.notify_all()
+                continue
+
+            if not self._deliver([x.event for x in stored]):
+                with self._condition:
+                    if not self._closed:
+                        self._condition.wait(self.retry_interval)
+                continue
+
+            self._write_checkpoint(stored[-1].position)
+            with self._condition:
+                self._position = stored[-1].position
+
+    def _compact(self):
+        """
+        Replace the spool with a copy of its undelivered records. The
+        checkpoint is reset before the copy is renamed into place, so a crash
+        in between only causes the delivered records to be delivered again.
+        """
+        path = self._spool.name
+        with open(path, "rb") as source:
+            source.seek(self._offset)
+            with open(path + ".tmp", "wb") as fp:
+                shutil.copyfileobj(source, fp)
+                self._sync(fp)
+
+        self._write_checkpoint(0)
+        self._spool.close()
+        os.rename(path + ".tmp", path)
+        self._spool = open(path, "a+b")
+        self._size -= self._offset
+        self._offset = 0
+
+    def _deliver(self, events):
+        """
+        Deliver a batch of events to every subscriber
+
+        :param events: The domain events
+        :type events: :class:`list`
+
+        :rtype: :class:`bool` whether every subscriber received the batch
+        """
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber(events)
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    "Could not deliver %d events to %r, will retry",
+                    len(events), subscriber)
+                return False
+        return True
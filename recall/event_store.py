@@ -1,15 +1,55 @@
 import abc
-import copy
+import collections
+import itertools
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import threading
 import uuid
 
+import event_marshaler
 import models
 
 
+class StoredEvent(collections.namedtuple(
+        "StoredEvent", ["position", "guid", "version", "event"])):
+    """
+    A domain event as stored in the global event log, along with its position
+    in the log and the guid and version of the domain entity it was applied to.
+    """
+    __slots__ = ()
+
+
+class ConcurrencyError(Exception):
+    """
+    Raised when a domain entity's events are saved against a version of its
+    stream other than the one the entity was loaded at, i.e. another writer
+    has appended to the stream in the meantime.
+    """
+    pass
+
+
 class EventStore(object):
     """
     The Event Store interface
+
+    Saves are optimistic: each entity's staged events are appended only if
+    its stream is still at the version the entity was loaded at, otherwise a
+    :class:`ConcurrencyError` is raised and nothing is appended.
+
+    Streams are read in pages of at most ``batch_size`` events (see
+    :meth:`iter_events`), so that replaying a stream never requires holding
+    more than a single page in memory. The iterators returned by the getters
+    may be lazy and should only be consumed once.
+
+    Every stored event is also given a position in a global log, which
+    increases monotonically in the order events are saved, so that readers
+    can catch up on all streams from a checkpoint (see :meth:`read_all`).
     """
     __metaclass__ = abc.ABCMeta
+    batch_size = 500
 
     @abc.abstractmethod
     def get_all_events(self, guid):
@@ -24,7 +64,7 @@ class EventStore(object):
         pass
 
     @abc.abstractmethod
-    def get_events_from_version(self, guid, version):
+    def get_events_from_version(self, guid, version, limit=None):
         """
         Get events for a domain entity as of a given version
 
@@ -34,8 +74,68 @@ class EventStore(object):
         :param version: The version of the domain entity
         :type version: :class:`int`
 
+        :param limit: The maximum number of events to get
+        :type limit: :class:`int`
+
+        :rtype: :class:`iterator`
+        """
+        pass
+
+    def iter_events(self, guid, version=0, batch_size=None):
+        """
+        Lazily get events for a domain entity as of a given version, reading
+        the stream one page of at most ``batch_size`` events at a time.
+
+        :param guid: The guid of the domain entity
+        :type guid: :class:`uuid.UUID`
+
+        :param version: The version of the domain entity
+        :type version: :class:`int`
+
+        :param batch_size: The number of events per page
+        :type batch_size: :class:`int`
+
         :rtype: :class:`iterator`
         """
+        assert isinstance(guid, uuid.UUID)
+        assert isinstance(version, int)
+        batch_size = batch_size or self.batch_size
+        while True:
+            events = list(self.get_events_from_version(
+                guid, version, batch_size))
+            for event in events:
+                yield event
+            if len(events) < batch_size:
+                return
+            version += batch_size
+
+    def get_events_for_many(self, versions):
+        """
+        Get events for many domain entities, each as of a given version
+
+        :param versions: The versions of the domain entities, by guid
+        :type versions: :class:`dict`
+
+        :rtype: :class:`dict`
+        """
+        assert isinstance(versions, dict)
+        return dict(
+            (guid, list(self.get_events_from_version(guid, version)))
+            for guid, version in versions.items())
+
+    @abc.abstractmethod
+    def read_all(self, from_position=0, batch_size=None):
+        """
+        Get the events stored after a position in the global log, in order
+
+        :param from_position: The position to read from (exclusive)
+        :type from_position: :class:`int`
+
+        :param batch_size: The maximum number of events to get
+        :type batch_size: :class:`int`
+
+        :rtype: :class:`list` of :class:`StoredEvent`
+        """
         pass
 
     @abc.abstractmethod
@@ -45,9 +145,31 @@ class EventStore(object):
 
         :param entity: The domain entity
         :type entity: :class:`recall.models.Entity`
+
+        :raises: :class:`ConcurrencyError`
         """
         pass
 
+    def _check_version(self, guid, expected, actual):
+        """
+        Check that a stream is at the version a domain entity expects
+
+        :param guid: The guid of the domain entity
+        :type guid: :class:`uuid.UUID`
+
+        :param expected: The version the domain entity was loaded at
+        :type expected: :class:`int`
+
+        :param actual: The current version of the stream
+        :type actual: :class:`int`
+
+        :raises: :class:`ConcurrencyError`
+        """
+        if expected != actual:
+            raise ConcurrencyError(
+                "Expected %s at version %d, but found version %d"
+                % (guid, expected, actual))
+
 
 class Memory(EventStore):
     """
@@ -57,6 +179,10 @@ class Memory(EventStore):
     def __init__(self):
         self._events = {}
         self._entities = {}
+        self._log = []
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._log_lock = threading.Lock()
 
     def get_all_events(self, guid):
         """
@@ -70,7 +196,7 @@ class Memory(EventStore):
         assert isinstance(guid, uuid.UUID)
         return self._events.get(guid)
 
-    def get_events_from_version(self, guid, version):
+    def get_events_from_version(self, guid, version, limit=None):
         """
         Get events for a domain entity as of a given version
 
@@ -80,11 +206,33 @@ class Memory(EventStore):
         :param version: The version of the domain entity
         :type version: :class:`int`
 
+        :param limit: The maximum number of events to get
+        :type limit: :class:`int`
+
         :rtype: :class:`iterator`
         """
         assert isinstance(guid, uuid.UUID)
         assert isinstance(version, int)
-        return (self._events.get(guid) or [])[version:]
+        assert isinstance(limit, int) or limit is None
+        end = version + limit if limit else None
+        return (self._events.get(guid) or [])[version:end]
+
+    def read_all(self, from_position=0, batch_size=None):
+        """
+        Get the events stored after a position in the global log, in order
+
+        :param from_position: The position to read from (exclusive)
+        :type from_position: :class:`int`
+
+        :param batch_size: The maximum number of events to get
+        :type batch_size: :class:`int`
+
+        :rtype: :class:`list` of :class:`StoredEvent`
+        """
+        assert isinstance(from_position, int)
+        assert isinstance(batch_size, int) or batch_size is None
+        return self._log[
+            from_position:from_position + (batch_size or self.batch_size)]
 
     def save(self, entity):
         """
@@ -94,10 +242,44 @@ class Memory(EventStore):
         :type entity: :class:`recall.models.Entity`
         """
         assert isinstance(entity, models.Entity)
-        for provider in entity._get_all_entities():
-            self._create_entity(provider)
-            for event in provider._events:
-                self._events[provider.guid].append(copy.copy(event))
+        providers = sorted(
+            entity._get_dirty_entities(),
+            key=lambda x: x.guid)
+        locks = [self._get_lock(x.guid) for x in providers]
+        for lock in locks:
+            lock.acquire()
+        try:
+            for provider in providers:
+                self._check_version(
+                    provider.guid,
+                    provider._version,
+                    len(self._events.get(provider.guid) or []))
+            with self._log_lock:
+                for provider in providers:
+                    self._create_entity(provider)
+                    stream = self._events[provider.guid]
+                    for event in provider._events:
+                        stream.append(event)
+                        self._log.append(StoredEvent(
+                            len(self._log) + 1,
+                            provider.guid,
+                            len(stream),
+                            event))
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _get_lock(self, guid):
+        """
+        Get the lock guarding appends to a single stream
+
+        :param guid: The guid of the domain entity
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`threading.Lock`
+        """
+        with self._locks_lock:
+            return self._locks.setdefault(guid, threading.Lock())
 
     def _create_entity(self, entity):
         """
@@ -109,3 +291,557 @@ class Memory(EventStore):
         assert isinstance(entity, models.Entity)
         if not self._events.get(entity.guid):
             self._events[entity.guid] = []
+
+
+class Marshaling(EventStore):
+    """
+    The base of event stores which persist marshaled events as serialized
+    record payloads.
+
+    :param marshaler: The event marshaler
+    :type marshaler: :class:`recall.event_marshaler.EventMarshaler`
+    """
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, marshaler=None):
+        assert (isinstance(marshaler, event_marshaler.EventMarshaler)
+                or marshaler is None)
+        self.marshaler = marshaler or event_marshaler.DefaultEventMarshaler()
+
+    def _encode(self, event):
+        """
+        Encode a domain event to a record payload
+
+        :param event: The domain event
+        :type event: :class:`recall.models.Event`
+
+        :rtype: :class:`str`
+        """
+        marshaled = self.marshaler.marshal(event)
+        if self.marshaler.binary:
+            return marshaled
+        return pickle.dumps(marshaled, pickle.HIGHEST_PROTOCOL)
+
+    def _decode_many(self, payloads):
+        """
+        Decode record payloads to domain events, in order
+
+        :param payloads: The record payloads
+        :type payloads: :class:`collections.Iterable`
+
+        :rtype: :class:`iterator`
+        """
+        if self.marshaler.binary:
+            return self.marshaler.unmarshal_many(payloads)
+        return self.marshaler.unmarshal_many(
+            pickle.loads(payload) for payload in payloads)
+
+
+class File(Marshaling):
+    """
+    An append-only event store of rolling segment files.
+
+    Marshaled events are appended to the active segment until it reaches
+    ``segment_size`` bytes, at which point a new segment is started. Every
+    record is also listed in an index file, from which a per-entity offset
+    index is kept in memory, so that reading a stream from a given version
+    seeks straight to the record instead of scanning the log. The position of
+    an event in the global log is the position of its entry in the index.
+
+    :param path: The directory holding the segment and index files
+    :type path: :class:`str`
+
+    :param segment_size: The size (in bytes) at which a segment is rolled
+    :type segment_size: :class:`int`
+
+    :param marshaler: The event marshaler
+    :type marshaler: :class:`recall.event_marshaler.EventMarshaler`
+
+    :param fsync: Whether to fsync the segment and index files on save
+    :type fsync: :class:`bool`
+    """
+    DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+    INDEX_NAME = "index"
+    SEGMENT_NAME = "%010d.segment"
+    RECORD_HEADER = struct.Struct(">16sI")
+    INDEX_ENTRY = struct.Struct(">16sIQI")
+
+    def __init__(self, path, segment_size=None, marshaler=None, fsync=False):
+        assert isinstance(path, (str, unicode))
+        assert isinstance(segment_size, int) or segment_size is None
+        super(File, self).__init__(marshaler)
+        self.path = path
+        self.segment_size = segment_size or self.DEFAULT_SEGMENT_SIZE
+        self.fsync = fsync
+        self._log = []
+        self._streams = {}
+        self._maps = {}
+        self._lock = threading.Lock()
+        self._map_lock = threading.Lock()
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._index = open(os.path.join(path, self.INDEX_NAME), "a+b")
+        self._load_index()
+        self._recover()
+
+    def get_all_events(self, guid):
+        """
+        Get all events for a domain entity
+
+        :param guid: The guid of the domain entity
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`iterator`
+        """
+        assert isinstance(guid, uuid.UUID)
+        return self.get_events_from_version(guid, 0)
+
+    def get_events_from_version(self, guid, version, limit=None):
+        """
+        Get events for a domain entity as of a given version
+
+        :param guid: The guid of the domain entity
+        :type guid: :class:`uuid.UUID`
+
+        :param version: The version of the domain entity
+        :type version: :class:`int`
+
+        :param limit: The maximum number of events to get
+        :type limit: :class:`int`
+
+        :rtype: :class:`iterator`
+        """
+        assert isinstance(guid, uuid.UUID)
+        assert isinstance(version, int)
+        assert isinstance(limit, int) or limit is None
+        end = version + limit if limit else None
+        positions = self._streams.get(guid, [])[version:end]
+        return self._decode_many(
+            self._read(*self._log[x][2:]) for x in positions)
+
+    def read_all(self, from_position=0, batch_size=None):
+        """
+        Get the events stored after a position in the global log, in order
+
+        :param from_position: The position to read from (exclusive)
+        :type from_position: :class:`int`
+
+        :param batch_size: The maximum number of events to get
+        :type batch_size: :class:`int`
+
+        :rtype: :class:`list` of :class:`StoredEvent`
+        """
+        assert isinstance(from_position, int)
+        assert isinstance(batch_size, int) or batch_size is None
+        entries = self._log[
+            from_position:from_position + (batch_size or self.batch_size)]
+        events = self._decode_many(self._read(*x[2:]) for x in entries)
+        return [
+            StoredEvent(position, entry[0], entry[1], event)
+            for position, entry, event in itertools.izip(
+                itertools.count(from_position + 1), entries, events)]
+
+    def save(self, entity):
+        """
+        Save a domain entity's events
+
+        :param entity: The domain entity
+        :type entity: :class:`recall.models.Entity`
+        """
+        assert isinstance(entity, models.Entity)
+        providers = entity._get_dirty_entities()
+        records = [
+            (provider.guid, self._encode(event))
+            for provider in providers
+            for event in provider._events]
+
+        if records:
+            with self._lock:
+                for provider in providers:
+                    self._check_version(
+                        provider.guid,
+                        provider._version,
+                        len(self._streams.get(provider.guid, [])))
+                self._append(records)
+
+    def close(self):
+        """
+        Close the index file and any open segment maps
+        """
+        with self._lock:
+            with self._map_lock:
+                for segment_map in self._maps.values():
+                    segment_map.close()
+                self._maps = {}
+            self._index.close()
+
+    def _append(self, records):
+        """
+        Append encoded records to the log, rolling segments as needed, and
+        then to the index.
+
+        :param records: A list of (guid, payload) pairs
+        :type records: :class:`list`
+        """
+        segment, offset = self._tail
+        buffers = {}
+        entries = []
+        for guid, payload in records:
+            size = self.RECORD_HEADER.size + len(payload)
+            if offset and offset + size > self.segment_size:
+                segment, offset = segment + 1, 0
+            buffers.setdefault(segment, []).extend([
+                self.RECORD_HEADER.pack(guid.bytes, len(payload)),
+                payload])
+            entries.append((guid, (
+                segment,
+                offset + self.RECORD_HEADER.size,
+                len(payload))))
+            offset += size
+
+        for number in sorted(buffers):
+            with open(self._segment_path(number), "ab") as fp:
+                fp.write("".join(buffers[number]))
+                self._sync(fp)
+
+        self._index.write("".join(
+            self.INDEX_ENTRY.pack(guid.bytes, *entry)
+            for guid, entry in entries))
+        self._sync(self._index)
+
+        for guid, entry in entries:
+            self._add_entry(guid, entry)
+        self._tail = (segment, offset)
+
+    def _add_entry(self, guid, entry):
+        """
+        Add an index entry to the global log and to the entity's stream
+
+        :param guid: The guid of the domain entity
+        :type guid: :class:`uuid.UUID`
+
+        :param entry: The (segment, offset, length) of the record
+        :type entry: :class:`tuple`
+        """
+        stream = self._streams.setdefault(guid, [])
+        stream.append(len(self._log))
+        self._log.append((guid, len(stream)) + entry)
+
+    def _sync(self, fp):
+        """
+        Flush a file, and fsync it if configured to do so
+
+        :param fp: The file
+        :type fp: :class:`file`
+        """
+        fp.flush()
+        if self.fsync:
+            os.fsync(fp.fileno())
+
+    def _read(self, segment, offset, length):
+        """
+        Read the payload of a single record
+
+        :param segment: The segment number
+        :type segment: :class:`int`
+
+        :param offset: The offset of the payload within the segment
+        :type offset: :class:`int`
+
+        :param length: The length of the payload
+        :type length: :class:`int`
+
+        :rtype: :class:`str`
+        """
+        return self._map(segment, offset + length)[offset:offset + length]
+
+    def _map(self, segment, size):
+        """
+        Get a read-only memory map of a segment covering at least ``size``
+        bytes, re-mapping the segment if it has grown since it was mapped.
+        Only re-mapping takes a lock (separate from the one held by
+        :meth:`save`), so reads neither wait for each other nor for writes.
+
+        :param segment: The segment number
+        :type segment: :class:`int`
+
+        :param size: The minimum size of the map
+        :type size: :class:`int`
+
+        :rtype: :class:`mmap.mmap`
+        """
+        segment_map = self._maps.get(segment)
+        if segment_map is not None and len(segment_map) >= size:
+            return segment_map
+
+        with self._map_lock:
+            segment_map = self._maps.get(segment)
+            if segment_map is None or len(segment_map) < size:
+                with open(self._segment_path(segment), "rb") as fp:
+                    segment_map = mmap.mmap(
+                        fp.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[segment] = segment_map
+
+            return segment_map
+
+    def _segment_path(self, segment):
+        """
+        Get the path of a segment file
+
+        :param segment: The segment number
+        :type segment: :class:`int`
+
+        :rtype: :class:`str`
+        """
+        return os.path.join(self.path, self.SEGMENT_NAME % segment)
+
+    def _load_index(self):
+        """
+        Build the per-entity offset index from the index file, discarding any
+        partially written trailing entry.
+        """
+        self._tail = (0, 0)
+        self._index.seek(0)
+        data = self._index.read()
+        usable = len(data) - len(data) % self.INDEX_ENTRY.size
+        if usable != len(data):
+            self._index.truncate(usable)
+
+        for pos in xrange(0, usable, self.INDEX_ENTRY.size):
+            raw, segment, offset, length = self.INDEX_ENTRY.unpack_from(
+                data, pos)
+            self._add_entry(uuid.UUID(bytes=raw), (segment, offset, length))
+            self._tail = max(self._tail, (segment, offset + length))
+
+    def _recover(self):
+        """
+        Index any complete records written to the segments after the last
+        indexed record (e.g. after a crash between the segment and index
+        writes), and truncate any partially written trailing record.
+        """
+        segment, offset = self._tail
+        recovered = []
+        while os.path.exists(self._segment_path(segment)):
+            with open(self._segment_path(segment), "r+b") as fp:
+                data = fp.read()
+                while offset + self.RECORD_HEADER.size <= len(data):
+                    raw, length = self.RECORD_HEADER.unpack_from(data, offset)
+                    start = offset + self.RECORD_HEADER.size
+                    if start + length > len(data):
+                        break
+                    recovered.append(
+                        (uuid.UUID(bytes=raw), (segment, start, length)))
+                    offset = start + length
+                if offset < len(data):
+                    fp.truncate(offset)
+
+            self._tail = (segment, offset)
+            if not os.path.exists(self._segment_path(segment + 1)):
+                break
+            segment, offset = segment + 1, 0
+
+        if recovered:
+            self._index.write("".join(
+                self.INDEX_ENTRY.pack(guid.bytes, *entry)
+                for guid, entry in recovered))
+            self._sync(self._index)
+            for guid, entry in recovered:
+                self._add_entry(guid, entry)
+
+
+class SQLite(Marshaling):
+    """
+    An SQLite event store. Events are stored one row per event with a unique
+    composite ``(guid, version)`` index, so reading a stream from a version is
+    a range scan of that index. The autoincrementing primary key of each row
+    is its position in the global log.
+
+    :param database: The database file name, or ``:memory:``
+    :type database: :class:`str`
+
+    :param marshaler: The event marshaler
+    :type marshaler: :class:`recall.event_marshaler.EventMarshaler`
+    """
+    MAX_STREAMS_PER_QUERY = 400
+
+    def __init__(self, database=":memory:", marshaler=None):
+        assert isinstance(database, (str, unicode))
+        super(SQLite, self).__init__(marshaler)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            database,
+            isolation_level=None,
+            check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "position INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "guid BLOB NOT NULL, "
+            "version INTEGER NOT NULL, "
+            "data BLOB NOT NULL)")
+        self._connection.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS events_guid_version "
+            "ON events (guid, version)")
+
+    def get_all_events(self, guid):
+        """
+        Get all events for a domain entity
+
+        :param guid: The guid of the domain entity
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`iterator`
+        """
+        assert isinstance(guid, uuid.UUID)
+        return self.get_events_from_version(guid, 0)
+
+    def get_events_from_version(self, guid, version, limit=None):
+        """
+        Get events for a domain entity as of a given version
+
+        :param guid: The guid of the domain entity
+        :type guid: :class:`uuid.UUID`
+
+        :param version: The version of the domain entity
+        :type version: :class:`int`
+
+        :param limit: The maximum number of events to get
+        :type limit: :class:`int`
+
+        :rtype: :class:`iterator`
+        """
+        assert isinstance(guid, uuid.UUID)
+        assert isinstance(version, int)
+        assert isinstance(limit, int) or limit is None
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT data FROM events "
+                "WHERE guid = ? AND version > ? "
+                "ORDER BY version LIMIT ?",
+                (buffer(guid.bytes), version, limit or -1)).fetchall()
+
+        return self._decode_many(str(data) for data, in rows)
+
+    def get_events_for_many(self, versions):
+        """
+        Get events for many domain entities, each as of a given version, with
+        one query per ``MAX_STREAMS_PER_QUERY`` entities.
+
+        :param versions: The versions of the domain entities, by guid
+        :type versions: :class:`dict`
+
+        :rtype: :class:`dict`
+        """
+        assert isinstance(versions, dict)
+        events = dict((guid, []) for guid in versions)
+        items = versions.items()
+        for start in xrange(0, len(items), self.MAX_STREAMS_PER_QUERY):
+            chunk = items[start:start + self.MAX_STREAMS_PER_QUERY]
+            params = []
+            for guid, version in chunk:
+                params.extend([buffer(guid.bytes), version])
+
+            with self._lock:
+                rows = self._connection.execute(
+                    "WITH wanted (guid, version) AS (VALUES %s) "
+                    "SELECT events.guid, events.data "
+                    "FROM wanted JOIN events "
+                    "ON events.guid = wanted.guid "
+                    "AND events.version > wanted.version "
+                    "ORDER BY events.guid, events.version"
+                    % ", ".join(["(?, ?)"] * len(chunk)),
+                    params).fetchall()
+
+            streams = itertools.groupby(rows, lambda x: x[0])
+            for raw, stream in streams:
+                events[uuid.UUID(bytes=str(raw))].extend(
+                    self._decode_many(str(data) for _, data in stream))
+
+        return events
+
+    def read_all(self, from_position=0, batch_size=None):
+        """
+        Get the events stored after a position in the global log, in order
+
+        :param from_position: The position to read from (exclusive)
+        :type from_position: :class:`int`
+
+        :param batch_size: The maximum number of events to get
+        :type batch_size: :class:`int`
+
+        :rtype: :class:`list` of :class:`StoredEvent`
+        """
+        assert isinstance(from_position, int)
+        assert isinstance(batch_size, int) or batch_size is None
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT position, guid, version, data FROM events "
+                "WHERE position > ? "
+                "ORDER BY position LIMIT ?",
+                (from_position, batch_size or self.batch_size)).fetchall()
+
+        events = self._decode_many(str(row[3]) for row in rows)
+        return [
+            StoredEvent(position, uuid.UUID(bytes=str(raw)), version, event)
+            for (position, raw, version, _), event in itertools.izip(
+                rows, events)]
+
+    def save(self, entity):
+        """
+        Save a domain entity's events in a single transaction
+
+        :param entity: The domain entity
+        :type entity: :class:`recall.models.Entity`
+        """
+        assert isinstance(entity, models.Entity)
+        providers = entity._get_dirty_entities()
+        rows = [
+            (buffer(provider.guid.bytes),
+             provider._version + number,
+             buffer(self._encode(event)))
+            for provider in providers
+            for number, event in enumerate(provider._events, 1)]
+
+        if not rows:
+            return
+
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                for provider in providers:
+                    self._check_version(
+                        provider.guid,
+                        provider._version,
+                        self._get_version(provider.guid))
+                self._connection.executemany(
+                    "INSERT INTO events (guid, version, data) "
+                    "VALUES (?, ?, ?)",
+                    rows)
+            except sqlite3.IntegrityError as e:
+                self._connection.execute("ROLLBACK")
+                raise ConcurrencyError(str(e))
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def _get_version(self, guid):
+        """
+        Get the current version of a stream
+
+        :param guid: The guid of the domain entity
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`int`
+        """
+        return self._connection.execute(
+            "SELECT COALESCE(MAX(version), 0) FROM events WHERE guid = ?",
+            (buffer(guid.bytes),)).fetchone()[0]
+
+    def close(self):
+        """
+        Close the database connection
+        """
+        with self._lock:
+            self._connection.close()
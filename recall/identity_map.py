@@ -0,0 +1,143 @@
+import collections
+import threading
+import time
+import uuid
+
+import models
+
+
+class LRU(collections.MutableMapping):
+    """
+    A bounded identity map of aggregate roots by guid, evicting the least
+    recently used roots first.
+
+    The map can be bounded by the number of roots (``max_size``), by their
+    total weight (``max_weight``), or both. A root is weighed once, when it is
+    put in the map; by default its weight is the number of entities in the
+    aggregate, which is a proxy for its memory footprint. Roots can also
+    expire ``ttl`` seconds after they are put in the map. Hits, misses,
+    evictions and expirations are counted.
+
+    :param max_size: The maximum number of roots
+    :type max_size: :class:`int`
+
+    :param max_weight: The maximum total weight of the roots
+    :type max_weight: :class:`int`
+
+    :param ttl: The time (in seconds) roots stay in the map
+    :type ttl: :class:`float`
+
+    :param weigher: A callable returning the weight of a root
+    :type weigher: :class:`collections.Callable`
+    """
+    def __init__(self, max_size=None, max_weight=None, ttl=None,
+                 weigher=None):
+        assert isinstance(max_size, int) or max_size is None
+        assert isinstance(max_weight, int) or max_weight is None
+        assert isinstance(ttl, (int, float)) or ttl is None
+        assert isinstance(weigher, collections.Callable) or weigher is None
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self.ttl = ttl
+        self.weigher = weigher or self._count_entities
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def __getitem__(self, guid):
+        with self._lock:
+            entry = self._entries.pop(guid, None)
+            if entry is None:
+                self.misses += 1
+                raise KeyError(guid)
+
+            root, weight, expires = entry
+            if expires is not None and expires <= time.time():
+                self.weight -= weight
+                self.expirations += 1
+                self.misses += 1
+                raise KeyError(guid)
+
+            self._entries[guid] = entry
+            self.hits += 1
+            return root
+
+    def __setitem__(self, guid, root):
+        assert isinstance(root, models.AggregateRoot)
+        weight = self.weigher(root)
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._discard(guid)
+            self._entries[guid] = (root, weight, expires)
+            self.weight += weight
+            self._evict()
+
+    def __delitem__(self, guid):
+        with self._lock:
+            if not self._discard(guid):
+                raise KeyError(guid)
+
+    def __contains__(self, guid):
+        with self._lock:
+            entry = self._entries.get(guid)
+            return entry is not None and (
+                entry[2] is None or entry[2] > time.time())
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """
+        Remove all roots from the map
+        """
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+
+    def _discard(self, guid):
+        """
+        Remove a root from the map, if present
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`bool`
+        """
+        entry = self._entries.pop(guid, None)
+        if entry is None:
+            return False
+        self.weight -= entry[1]
+        return True
+
+    def _evict(self):
+        """
+        Evict the least recently used roots until the map is within bounds,
+        always keeping the most recently used one
+        """
+        while len(self._entries) > 1 and (
+                (self.max_size is not None
+                 and len(self._entries) > self.max_size)
+                or (self.max_weight is not None
+                    and self.weight > self.max_weight)):
+            guid = next(iter(self._entries))
+            self._discard(guid)
+            self.evictions += 1
+
+    def _count_entities(self, root):
+        """
+        Weigh a root by the number of entities in its aggregate
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :rtype: :class:`int`
+        """
+        return sum(1 for _ in root._get_all_entities())
@@ -1,5 +1,6 @@
 import abc
 import collections
+import inspect
 import itertools
 import uuid
 
@@ -35,13 +36,46 @@ class Command(collections.Mapping):
         pass
 
 
+class FrozenDict(dict):
+    """
+    An immutable, hashable :class:`dict` (provided its values are hashable).
+    Mappings in an event payload are frozen to it.
+    """
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def _immutable(self, *args, **kwargs):
+        """
+        Refuse to mutate the mapping
+
+        :raises: :class:`TypeError`
+        """
+        raise TypeError("%s is immutable" % self.__class__.__name__)
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _immutable
+
+
 class Event(collections.Mapping):
     """
     An event object. This object is simply used to shuttle data between the
     write model and the read model. Conceptually, it is a token which represents
     that some action has happened in the domain (write) model which may or may
-    not have resulted in a state change. In practice, it's a :class:`dict`,
-    though it should be assumed to be immutable.
+    not have resulted in a state change. In practice, it's an immutable
+    :class:`dict`: attributes can't be set once it is created, lists in its
+    payload are frozen to tuples and mappings to :class:`FrozenDict`, and it
+    is hashable (provided its payload is).
+    Events can therefore be shared freely, e.g. between an entity and the
+    event store, without being copied.
 
     **Important**: An event can *never* be rejected (though it can be ignored).
     It represents a *change which has already happened* -- rejecting it would
@@ -50,8 +84,31 @@ class Event(collections.Mapping):
     def __init__(self, *args, **kwargs):
         assert not args
         assert kwargs
-        self._data = kwargs
         self.require(**kwargs)
+        object.__setattr__(self, "_data", dict(
+            (k, self._freeze(v)) for k, v in kwargs.items()))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s is immutable" % self.__class__.__name__)
+
+    def __eq__(self, other):
+        return (self.__class__ is other.__class__
+                and self._data == other._data)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.__class__, frozenset(self._data.items())))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __getitem__(self, key):
         return self._data[key]
@@ -78,18 +135,239 @@ class Event(collections.Mapping):
         """
         return self._data.items()
 
+    @classmethod
+    def _restore(cls, data):
+        """
+        Rebuild an event from stored data, without calling ``require``: it
+        was validated when the event was first created
+
+        :param data: The event data
+        :type data: :class:`dict`
+
+        :rtype: :class:`recall.models.Event`
+        """
+        event = cls.__new__(cls)
+        object.__setattr__(event, "_data", dict(
+            (k, cls._freeze(v)) for k, v in data.items()))
+        return event
+
+    @classmethod
+    def _freeze(cls, value):
+        """
+        Freeze a payload value, converting lists to tuples and mappings to
+        :class:`FrozenDict`
+
+        :param value: The payload value
+        :type value: :class:`object`
+
+        :rtype: :class:`object`
+        """
+        if isinstance(value, list):
+            return tuple(cls._freeze(v) for v in value)
+        if isinstance(value, dict) and type(value) is not FrozenDict:
+            return FrozenDict((k, cls._freeze(v)) for k, v in value.items())
+        return value
+
+
+class CompactEventMeta(abc.ABCMeta):
+    """
+    The metaclass of :class:`CompactEvent`. It derives the fields of each
+    event class from the signature of its ``require`` method, once, when the
+    class is created.
+    """
+    def __new__(mcs, name, bases, attrs):
+        require = attrs.get("require")
+        if require and not getattr(require, "__isabstractmethod__", False):
+            spec = inspect.getargspec(require)
+            assert not spec.varargs and not spec.keywords
+            attrs["_fields"] = tuple(spec.args[1:])
+        attrs.setdefault("__slots__", ())
+        cls = super(CompactEventMeta, mcs).__new__(mcs, name, bases, attrs)
+        cls._positions = dict((k, i) for i, k in enumerate(cls._fields))
+        return cls
+
+
+class _Missing(object):
+    """
+    The placeholder for an optional field which was not given. It is a
+    singleton, which pickles by reference to :data:`_MISSING`.
+    """
+    def __repr__(self):
+        return "<missing>"
+
+    def __reduce__(self):
+        return "_MISSING"
+
+_MISSING = _Missing()
+
+
+def _compact_event(cls, values):
+    """
+    Rebuild a compact event from its field values, e.g. when unpickling
+
+    :param cls: The compact event class
+    :type cls: :class:`type`
+
+    :param values: The field values
+    :type values: :class:`tuple`
+
+    :rtype: :class:`recall.models.CompactEvent`
+    """
+    event = cls.__new__(cls)
+    object.__setattr__(event, "_values", values)
+    return event
+
+
+class CompactEvent(object):
+    """
+    A memory-compact, opt-in alternative to :class:`Event`. Instead of a
+    per-instance :class:`dict`, the payload is kept in a single tuple slot,
+    ordered by the fields of the ``require`` signature. It behaves as an
+    immutable :class:`Event` in every other respect (and is registered as
+    one), so it may be used anywhere an event is expected.
+    """
+    __metaclass__ = CompactEventMeta
+    __slots__ = ("_values",)
+    _fields = ()
+
+    def __init__(self, *args, **kwargs):
+        assert not args
+        assert kwargs
+        self.require(**kwargs)
+        object.__setattr__(self, "_values", tuple(
+            Event._freeze(kwargs.get(k, _MISSING)) for k in self._fields))
+
+    def __getitem__(self, key):
+        value = self._values[self._positions[key]]
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return (k for k, v in zip(self._fields, self._values)
+                if v is not _MISSING)
+
+    def __len__(self):
+        return sum(1 for v in self._values if v is not _MISSING)
+
+    def __contains__(self, key):
+        return (key in self._positions
+                and self._values[self._positions[key]] is not _MISSING)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s is immutable" % self.__class__.__name__)
+
+    def __eq__(self, other):
+        return (self.__class__ is other.__class__
+                and self._data == other._data)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.__class__, self._values))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return _compact_event, (self.__class__, self._values)
+
+    @classmethod
+    def _restore(cls, data):
+        """
+        Rebuild an event from stored data, without calling ``require``: it
+        was validated when the event was first created
+
+        :param data: The event data
+        :type data: :class:`dict`
+
+        :rtype: :class:`recall.models.CompactEvent`
+        """
+        return _compact_event(cls, tuple(
+            Event._freeze(data.get(k, _MISSING)) for k in cls._fields))
+
+    @property
+    def _data(self):
+        """
+        :rtype: :class:`dict`
+        """
+        return dict(self.items())
+
+    @abc.abstractmethod
+    def require(self, **kwargs):
+        pass
+
+    def get(self, key, default=None):
+        """
+        :rtype: :class:`object`
+        """
+        return self[key] if key in self else default
+
+    def keys(self):
+        """
+        :rtype: :class:`list`
+        """
+        return list(self)
+
+    def values(self):
+        """
+        :rtype: :class:`list`
+        """
+        return [v for v in self._values if v is not _MISSING]
+
+    def items(self):
+        """
+        :rtype: :class:`list`
+        """
+        return [(k, v) for k, v in zip(self._fields, self._values)
+                if v is not _MISSING]
+
+    def iterkeys(self):
+        """
+        :rtype: :class:`iterator`
+        """
+        return iter(self)
+
+    def itervalues(self):
+        """
+        :rtype: :class:`iterator`
+        """
+        return (v for v in self._values if v is not _MISSING)
+
+    def iteritems(self):
+        """
+        :rtype: :class:`iterator`
+        """
+        return ((k, v) for k, v in zip(self._fields, self._values)
+                if v is not _MISSING)
+
+Event.register(CompactEvent)
+
 
 class EntityList(collections.MutableMapping):
     """
     A collection of domain entities, implemented as a :class:`dict` to allow
-    efficient, random access by key.
+    efficient, random access by key. The keys of the members which are
+    entities (or collections of them) are registered as they are set, so that
+    walking the entity graph doesn't have to inspect every member.
     """
     def __init__(self, *args, **kwargs):
         assert not args
-        self._data = kwargs
+        self._root = None
+        self._data = {}
+        self._child_keys = set()
+        self.update(kwargs)
 
     def __delitem__(self, key):
         del(self._data[key])
+        self._get_child_keys().discard(key)
 
     def __getitem__(self, key):
         return self._data[key]
@@ -102,6 +380,13 @@ class EntityList(collections.MutableMapping):
 
     def __setitem__(self, key, value):
         self._data[key] = value
+        if isinstance(value, (Entity, EntityList)):
+            self._get_child_keys().add(key)
+            root = self.__dict__.get("_root")
+            if root is not None:
+                value._set_root(root)
+        else:
+            self._get_child_keys().discard(key)
 
     def add(self, entity):
         """
@@ -129,9 +414,9 @@ class EntityList(collections.MutableMapping):
 
         :rtype: :class:`iterator`
         """
+        data = self._data
         return itertools.chain.from_iterable(
-            x._get_all_entities() for x in self.values()
-            if isinstance(x, EntityList) or isinstance(x, Entity))
+            data[k]._get_all_entities() for k in self._get_child_keys())
 
     def _get_all_entities(self):
         """
@@ -141,18 +426,123 @@ class EntityList(collections.MutableMapping):
         """
         return self._get_child_entities()
 
+    def _get_child_keys(self):
+        """
+        Get the keys of the members which are entities, or collections of
+        them. Collections unpickled from before the keys were registered are
+        scanned once.
+
+        :rtype: :class:`set`
+        """
+        keys = self.__dict__.get("_child_keys")
+        if keys is None:
+            keys = self._child_keys = set(
+                k for k, v in self._data.items()
+                if isinstance(v, (Entity, EntityList)))
+        return keys
+
+    def _set_root(self, root):
+        """
+        Attach the collection, and all its members, to an aggregate root
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+        """
+        self._root = root
+        data = self._data
+        for key in self._get_child_keys():
+            data[key]._set_root(root)
+
+
+def handles(*event_classes):
+    """
+    Declare a method of an entity class as the handler of one or more domain
+    event classes. The method is called with the event, as ``method(event)``.
+
+    :param event_classes: The event types to handle
+    :type event_classes: :class:`tuple`
+
+    :rtype: :class:`collections.Callable`
+    """
+    assert all(isinstance(x, type) for x in event_classes)
+
+    def decorator(func):
+        func._handles = getattr(func, "_handles", ()) + event_classes
+        return func
+
+    return decorator
+
+
+class EntityMeta(abc.ABCMeta):
+    """
+    The metaclass of :class:`Entity`. It builds the event handler table of
+    each entity class from the methods declared with :func:`handles`
+    (including inherited ones), once, when the class is created. It derives
+    from :class:`abc.ABCMeta`, so that entities can still declare abstract
+    methods.
+    """
+    def __new__(mcs, name, bases, attrs):
+        cls = super(EntityMeta, mcs).__new__(mcs, name, bases, attrs)
+        names = dict(getattr(cls, "_event_handler_names", {}))
+        for key, value in attrs.items():
+            for event_cls in getattr(value, "_handles", ()):
+                names[event_cls] = key
+
+        handlers = {}
+        for event_cls, key in names.items():
+            handler = getattr(cls, key)
+            handlers[event_cls] = getattr(handler, "__func__", handler)
+
+        cls._event_handler_names = names
+        cls._event_handlers = handlers
+        return cls
+
 
 class Entity(object):
     """
     A domain entity. This is a base implementation of a domain model in the
     sense of Domain Driven Design by Eric Evans. This model is also event-
     sourced, supporting an event-driven style of architecture.
+
+    The names of the attributes holding child entities (or collections of
+    them) are registered as they are assigned, so that walking the entity
+    graph doesn't have to inspect every attribute. Assigned children are also
+    attached to the aggregate root of their parent, which keeps track of the
+    entities with staged events (see :meth:`_get_dirty_entities`).
+
+    Domain events are dispatched to the methods declared with :func:`handles`
+    through a table built once per class, or to the handlers registered on the
+    instance with :meth:`_register_event_handler`, which take precedence.
     """
+    __metaclass__ = EntityMeta
+
     def __init__(self):
+        self.__dict__.setdefault("_child_names", set())
+        self.__dict__["_root"] = None
         self.guid = None
         self._version = 0
         self._events = []
         self._handlers = {}
+        if isinstance(self, AggregateRoot):
+            self.__dict__["_root"] = self
+            self._dirty = collections.OrderedDict()
+
+    def __setattr__(self, name, value):
+        names = self.__dict__.get("_child_names")
+        if names is None:
+            names = self._get_child_names()
+        if isinstance(value, (Entity, EntityList)):
+            names.add(name)
+            root = self.__dict__.get("_root")
+            if root is not None:
+                value._set_root(root)
+        elif name in names:
+            names.discard(name)
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        object.__delattr__(self, name)
+        self._get_child_names().discard(name)
 
     def get_all_events(self):
         """
@@ -162,7 +552,7 @@ class Entity(object):
         :rtype: :class:`iterator`
         """
         return itertools.chain.from_iterable(
-            x._events for x in self._get_all_entities())
+            x._events for x in self._get_dirty_entities())
 
     def _apply_event(self, event):
         """
@@ -176,7 +566,11 @@ class Entity(object):
         """
         assert isinstance(event, Event)
         self._handle_domain_event(event)
-        self._events += [event]
+        if not self._events:
+            root = self.__dict__.get("_root")
+            if root is not None:
+                root._set_dirty(self)
+        self._events.append(event)
 
     def _get_child_entities(self):
         """
@@ -184,9 +578,9 @@ class Entity(object):
 
         :rtype: :class:`iterator`
         """
+        attrs = self.__dict__
         return itertools.chain.from_iterable(
-            x._get_all_entities() for x in self.__dict__.values()
-            if isinstance(x, EntityList) or isinstance(x, Entity))
+            attrs[k]._get_all_entities() for k in self._get_child_names())
 
     def _get_all_entities(self):
         """
@@ -197,6 +591,65 @@ class Entity(object):
         """
         return itertools.chain([self], self._get_child_entities())
 
+    def _get_child_names(self):
+        """
+        Get the names of the attributes holding child entities, or collections
+        of them. Entities unpickled from before the names were registered are
+        scanned once.
+
+        :rtype: :class:`set`
+        """
+        names = self.__dict__.get("_child_names")
+        if names is None:
+            names = self.__dict__["_child_names"] = set(
+                k for k, v in self.__dict__.items()
+                if isinstance(v, (Entity, EntityList)) and k != "_root")
+        return names
+
+    def _get_dirty_entities(self):
+        """
+        Get the entities of the aggregate which have staged events, in the
+        order they were first changed.
+
+        Aggregate roots keep track of these as events are applied. Other
+        entities, and aggregate roots unpickled from before the tracking, have
+        their entity graph scanned (the latter only once).
+
+        :rtype: :class:`list`
+        """
+        dirty = self.__dict__.get("_dirty")
+        if dirty is None:
+            if not isinstance(self, AggregateRoot):
+                return [x for x in self._get_all_entities() if x._events]
+            dirty = self._dirty = collections.OrderedDict()
+            self._set_root(self)
+        return [x for x in dirty.values() if x._events]
+
+    def _set_dirty(self, entity):
+        """
+        Keep track of an entity of the aggregate which has staged events
+
+        :param entity: The domain entity
+        :type entity: :class:`recall.models.Entity`
+        """
+        dirty = self.__dict__.get("_dirty")
+        if dirty is not None:
+            dirty[id(entity)] = entity
+
+    def _set_root(self, root):
+        """
+        Attach the entity, and all its child entities, to an aggregate root
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+        """
+        self.__dict__["_root"] = root
+        if self._events:
+            root._set_dirty(self)
+        attrs = self.__dict__
+        for name in self._get_child_names():
+            attrs[name]._set_root(root)
+
     def _create_guid(self):
         """
         Create an entity GUID
@@ -214,8 +667,42 @@ class Entity(object):
         """
         assert isinstance(event, Event)
         event_cls = event.__class__
-        if event_cls in self._handlers:
-            self._handlers[event_cls](self)(event)
+        handlers = self._handlers
+        if handlers and event_cls in handlers:
+            handlers[event_cls](self)(event)
+            return
+
+        handler = self._event_handlers.get(event_cls)
+        if handler is not None:
+            handler(self, event)
+
+    def _replay_events(self, events):
+        """
+        Applies stored domain events to a domain entity, and increments its
+        version once for all of them. Unlike :meth:`_handle_domain_event`, the
+        events are not checked: they are trusted to come from the event store.
+
+        :param events: The domain events
+        :type events: :class:`collections.Iterable`
+
+        :rtype: :class:`int`
+        """
+        handlers = self._handlers
+        table = self._event_handlers
+        count = 0
+        try:
+            for event in events:
+                event_cls = event.__class__
+                if handlers and event_cls in handlers:
+                    handlers[event_cls](self)(event)
+                else:
+                    handler = table.get(event_cls)
+                    if handler is not None:
+                        handler(self, event)
+                count += 1
+        finally:
+            self._version += count
+        return count
 
     def _increment_version(self, amount=1):
         """
@@ -232,10 +719,15 @@ class Entity(object):
         Removes a domain entity's staged events.
         """
         self._events = []
+        root = self.__dict__.get("_root")
+        if root is not None:
+            root.__dict__.get("_dirty", {}).pop(id(self), None)
 
     def _register_event_handler(self, event_cls, callback_cls):
         """
-        Register a domain event handler for an event
+        Register a domain event handler for an event, on this entity only.
+        Handlers declared on the class with :func:`handles` are built once
+        per class and don't instantiate a handler per event.
 
         :param event_cls: The event type to handle
         :type event_cls: :class:`type`
@@ -1,9 +1,14 @@
 import collections
+import logging
+import Queue
+import threading
+import time
 import uuid
 
 import event_store
 import event_router
 import models
+import snapshot_policy
 import snapshot_store
 
 
@@ -13,11 +18,17 @@ class Repository(object):
     mimics the memento pattern. The pattern isn't as important as the fact that
     the repository will always give you the aggregate root at it's latest
     version. It does this by first trying to load from an in-memory identity
-    map, then from a snapshot, and lastly from the event stream.
+    map, then from a snapshot, and lastly from the event stream. The identity
+    map is a plain :class:`dict` by default, which grows without bound; a
+    bounded map, such as :class:`recall.identity_map.LRU`, can be given instead.
 
     Saving works much the same way, but in reverse. First all staged events are
     stored in the event stream, then those events are routed (if necessary), and
-    then a snapshot is taken (if needed).
+    then a snapshot is taken (if the snapshot policy decides it is worth it).
+
+    Snapshots can optionally be taken off the request thread, by a pool of
+    ``snapshot_workers`` (see :class:`SnapshotWorker`). Call :meth:`close` to
+    finish any pending snapshots on shutdown.
 
     :param root_cls: The class object of the Aggregate Root
     :type root_cls: :class:`type`
@@ -31,22 +42,56 @@ class Repository(object):
     :param event_router_: The event router
     :type event_router_: :class:`recall.event_router.EventRouter`
 
-    :param snapshot_frequency: The snapshot frequency
+    :param snapshot_frequency: The snapshot frequency, used by the default
+        :class:`recall.snapshot_policy.EventCount` policy
     :type snapshot_frequency: :class:`int`
+
+    :param snapshot_workers: The number of background snapshot threads, or 0
+        to take snapshots inline
+    :type snapshot_workers: :class:`int`
+
+    :param snapshot_backlog: The maximum number of pending background
+        snapshots
+    :type snapshot_backlog: :class:`int`
+
+    :param snapshot_policy_: The snapshot policy
+    :type snapshot_policy_: :class:`recall.snapshot_policy.SnapshotPolicy`
+
+    :param identity_map_: The identity map
+    :type identity_map_: :class:`collections.MutableMapping`
+
+    :param trusted_replay: Whether to replay stored events without checking
+        them, and bump versions once per batch rather than once per event
+        (see :meth:`recall.models.Entity._replay_events`)
+    :type trusted_replay: :class:`bool`
     """
     def __init__(self, root_cls, event_store_, snapshot_store_, event_router_,
-                 snapshot_frequency):
+                 snapshot_frequency, snapshot_workers=0, snapshot_backlog=100,
+                 snapshot_policy_=None, identity_map_=None,
+                 trusted_replay=False):
         assert isinstance(root_cls, type)
         assert isinstance(event_store_, event_store.EventStore)
         assert isinstance(snapshot_store_, snapshot_store.SnapshotStore)
         assert isinstance(event_router_, event_router.EventRouter)
         assert isinstance(snapshot_frequency, int)
-        self.identity_map = {}
+        assert isinstance(snapshot_workers, int)
+        assert (isinstance(snapshot_policy_, snapshot_policy.SnapshotPolicy)
+                or snapshot_policy_ is None)
+        assert (isinstance(identity_map_, collections.MutableMapping)
+                or identity_map_ is None)
+        assert isinstance(trusted_replay, bool)
+        self.identity_map = identity_map_ if identity_map_ is not None else {}
         self.root_cls = root_cls
         self.event_store = event_store_
         self.snapshot_store = snapshot_store_
         self.event_router = event_router_
         self.snapshot_frequency = snapshot_frequency
+        self.trusted_replay = trusted_replay
+        self.snapshot_policy = (
+            snapshot_policy_ or snapshot_policy.EventCount(snapshot_frequency))
+        self.snapshot_worker = (
+            SnapshotWorker(self, snapshot_workers, snapshot_backlog)
+            if snapshot_workers else None)
 
     def load(self, guid):
         """
@@ -62,46 +107,157 @@ class Repository(object):
         self._update_children(root)
         return root
 
+    def load_many(self, guids):
+        """
+        Get many aggregate roots by GUID. Roots found in the identity map are
+        used as-is, and the remaining roots are loaded with a single batch of
+        snapshot reads and a single batch of event store reads.
+
+        :param guids: The guids of the aggregate roots
+        :type guids: :class:`collections.Iterable`
+
+        :rtype: :class:`list`
+        """
+        assert isinstance(guids, collections.Iterable)
+        guids = list(guids)
+        roots = {}
+        for guid in guids:
+            assert isinstance(guid, uuid.UUID)
+            root = self._load_from_identity_map(guid)
+            if root:
+                roots[guid] = root
+
+        missing = set(guids) - set(roots)
+        if missing:
+            start = time.time()
+            snapshots = self.snapshot_store.load_many(missing)
+            loaded = dict(
+                (guid, snapshots.get(guid) or self.root_cls())
+                for guid in missing)
+            events = self.event_store.get_events_for_many(dict(
+                (guid, root._version) for guid, root in loaded.items()))
+
+            counts = dict(
+                (guid, self._push_events(root, events.get(guid, [])))
+                for guid, root in loaded.items())
+            seconds = (time.time() - start) / max(sum(counts.values()), 1)
+
+            found = []
+            for guid, root in loaded.items():
+                if not root._version:
+                    continue
+                self.snapshot_policy.loaded(
+                    root, counts[guid], counts[guid] * seconds)
+                found.append(root)
+
+            self._update_many_children(found)
+            for root in found:
+                self.identity_map[root.guid] = root
+                roots[root.guid] = root
+
+        return [roots.get(guid) for guid in guids]
+
     def save(self, root):
         """
         Save an aggregate root
 
+        If another writer has saved the aggregate since it was loaded, the
+        root is evicted from the identity map and the
+        :class:`recall.event_store.ConcurrencyError` is raised, so that the
+        caller can load the latest version and retry.
+
+        The root is cleaned as soon as its events are stored, and they are
+        routed before any snapshot is taken. An error raised by the event
+        router, e.g. :class:`Queue.Full` from a
+        :class:`recall.event_router.Batching` router with a timeout, is
+        propagated, but the save itself has succeeded: the events are stored,
+        and only some of them may have been routed. To deliver stored events
+        even if the process dies before routing them, use an
+        :class:`recall.event_router.Outbox` reading from the event store.
+
         :param root: The aggregate root
         :type root: :class:`recall.models.AggregateRoot`
+
+        :raises: :class:`recall.event_store.ConcurrencyError`
         """
         assert isinstance(root, models.AggregateRoot)
-        if not root.get_all_events():
+        events = list(root.get_all_events())
+        if not events:
             return
 
-        self.event_store.save(root)
-        self._route_all_events(root)
+        try:
+            self.event_store.save(root)
+        except event_store.ConcurrencyError:
+            self.identity_map.pop(root.guid, None)
+            raise
+
         self._clean_entity(root)
-        if root._version % self.snapshot_frequency == 0:
-            self.snapshot_store.save(root)
+        self._route_all_events(root, events)
+        if (self.snapshot_policy.should_snapshot(root, len(events))
+                and self._take_snapshot(root)):
+            self.snapshot_policy.snapshotted(root)
+
+    def flush(self):
+        """
+        Wait for any pending background snapshots to be taken, and for any
+        events routed in the background to be delivered
+        """
+        if self.snapshot_worker:
+            self.snapshot_worker.flush()
+        self.event_router.flush()
+
+    def close(self):
+        """
+        Take any pending background snapshots and stop the snapshot workers,
+        then deliver any events routed in the background and close the event
+        router (which may be shared with other repositories)
+        """
+        if self.snapshot_worker:
+            self.snapshot_worker.close()
+        self.event_router.close()
+
+    def _take_snapshot(self, root):
+        """
+        Take a snapshot of an aggregate root, or submit it to the background
+        snapshot workers
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :rtype: :class:`bool` whether the snapshot was taken or queued
+        """
+        assert isinstance(root, models.AggregateRoot)
+        if self.snapshot_worker:
+            return self.snapshot_worker.submit(root.guid)
+        self.snapshot_store.save(root)
+        return True
 
     def _clean_entity(self, root):
         """
         Clears staged events and increments versions on all entities in the
-        aggregate.
+        aggregate which have staged events.
 
         :param root: The aggregate root
         :type root: :class:`recall.models.AggregateRoot`
         """
         assert isinstance(root, models.AggregateRoot)
-        for entity in root._get_all_entities():
+        for entity in root._get_dirty_entities():
             entity._increment_version(len(entity._events))
             entity._clear_events()
 
-    def _route_all_events(self, root):
+    def _route_all_events(self, root, events):
         """
-        Routes all staged events for all entities in the aggregate.
+        Routes the events saved with an aggregate root.
 
         :param root: The aggregate root
         :type root: :class:`recall.models.AggregateRoot`
+
+        :param events: The domain events
+        :type events: :class:`list`
         """
         assert isinstance(root, models.AggregateRoot)
-        for event in root.get_all_events():
-            self.event_router.route(event)
+        assert isinstance(events, list)
+        self.event_router.route_all(root.guid, events)
 
     def _load_entity(self, guid):
         """
@@ -113,9 +269,12 @@ class Repository(object):
         :rtype: :class:`recall.models.AggregateRoot`
         """
         assert isinstance(guid, uuid.UUID)
+        entity = self._load_from_identity_map(guid)
+        if entity:
+            return entity
+
         entity = (
-            self._load_from_identity_map(guid)
-            or self._load_from_snapshot(guid)
+            self._load_from_snapshot(guid)
             or self._load_from_event_store(guid)
         )
 
@@ -146,12 +305,11 @@ class Repository(object):
         :rtype: :class:`recall.models.AggregateRoot`
         """
         assert isinstance(guid, uuid.UUID)
-        entity = self.snapshot_store.load(guid)
+        start = time.time()
+        entity, count = self._rebuild_from_snapshot(guid)
 
         if entity:
-            events = self.event_store.get_events_from_version(
-                guid, entity._version)
-            self._push_events(entity, events)
+            self.snapshot_policy.loaded(entity, count, time.time() - start)
 
         return entity
 
@@ -165,11 +323,46 @@ class Repository(object):
         :rtype: :class:`recall.models.AggregateRoot`
         """
         assert isinstance(guid, uuid.UUID)
-        ar = self.root_cls()
-        events = self.event_store.get_all_events(guid)
-        self._push_events(ar, events)
+        start = time.time()
+        ar, count = self._rebuild_from_event_store(guid)
+        self.snapshot_policy.loaded(ar, count, time.time() - start)
         return ar
 
+    def _rebuild_from_snapshot(self, guid):
+        """
+        Rebuild an aggregate root from a snapshot and the events after it,
+        without reporting the load to the snapshot policy
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`tuple` of the aggregate root (or ``None``) and the
+            number of events replayed
+        """
+        assert isinstance(guid, uuid.UUID)
+        entity = self.snapshot_store.load(guid)
+        if not entity:
+            return None, 0
+
+        events = self.event_store.iter_events(guid, entity._version)
+        return entity, self._push_events(entity, events)
+
+    def _rebuild_from_event_store(self, guid):
+        """
+        Rebuild an aggregate root from the event stream, without reporting
+        the load to the snapshot policy
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`tuple` of the aggregate root and the number of events
+            replayed
+        """
+        assert isinstance(guid, uuid.UUID)
+        ar = self.root_cls()
+        events = self.event_store.iter_events(guid)
+        return ar, self._push_events(ar, events)
+
     def _update_children(self, entity):
         """
         Updates all children on a domain entity to their current version.
@@ -178,11 +371,40 @@ class Repository(object):
         :type entity: :class:`recall.models.Entity`
         """
         assert isinstance(entity, models.Entity)
-        for child in entity._get_child_entities():
-            self._push_events(child, self.event_store.get_events_from_version(
-                child.guid,
-                child._version))
-            self._update_children(child)
+        self._update_many_children([entity])
+
+    def _update_many_children(self, entities):
+        """
+        Updates all children on many domain entities to their current version.
+
+        All the children are caught up with one batched event store read.
+        Replaying those events may create more children, which are caught up
+        with another read, so the number of reads does not depend on the size
+        of the aggregates.
+
+        :param entities: The domain entities
+        :type entities: :class:`collections.Iterable`
+        """
+        assert isinstance(entities, collections.Iterable)
+        children = [
+            child
+            for entity in entities
+            for child in entity._get_child_entities()]
+        seen = set(id(child) for child in children)
+
+        while children:
+            events = self.event_store.get_events_for_many(dict(
+                (child.guid, child._version) for child in children))
+            updated = [
+                child for child in children
+                if self._push_events(child, events.get(child.guid, []))]
+
+            children = [
+                descendant
+                for child in updated
+                for descendant in child._get_child_entities()
+                if id(descendant) not in seen]
+            seen.update(id(child) for child in children)
 
     def _push_events(self, entity, events):
         """
@@ -193,9 +415,122 @@ class Repository(object):
 
         :param events: The domain events
         :type events: :class:`collections.Iterable`
+
+        :rtype: :class:`int`
         """
         assert isinstance(entity, models.Entity)
         assert isinstance(events, collections.Iterable)
+        if self.trusted_replay:
+            return entity._replay_events(events)
+
+        count = 0
         for event in events:
             entity._handle_domain_event(event)
             entity._increment_version()
+            count += 1
+        return count
+
+
+class SnapshotWorker(object):
+    """
+    A pool of threads taking snapshots for a repository in the background.
+
+    The worker never serializes the live aggregate root, which the request
+    thread may go on to mutate. Instead, it rebuilds a private copy of the
+    root from the snapshot and event stores, exactly as a load would (without
+    touching the identity map, or reporting the replay to the snapshot
+    policy), and snapshots that copy.
+
+    The backlog is bounded: when it is full, or when the root is already
+    pending, a submitted snapshot is dropped. Snapshots are only an
+    optimization, and the root will be submitted again on a later save.
+
+    :param repository: The repository
+    :type repository: :class:`recall.repository.Repository`
+
+    :param workers: The number of threads
+    :type workers: :class:`int`
+
+    :param backlog: The maximum number of pending snapshots
+    :type backlog: :class:`int`
+    """
+    def __init__(self, repository, workers=1, backlog=100):
+        assert isinstance(repository, Repository)
+        assert isinstance(workers, int) and workers > 0
+        assert isinstance(backlog, int) and backlog > 0
+        self.repository = repository
+        self._queue = Queue.Queue(backlog)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work) for _ in range(workers)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def submit(self, guid):
+        """
+        Submit an aggregate root to be snapshotted, unless the backlog is full
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`bool`
+        """
+        assert isinstance(guid, uuid.UUID)
+        with self._lock:
+            if guid in self._pending:
+                return False
+            try:
+                self._queue.put_nowait(guid)
+            except Queue.Full:
+                return False
+            self._pending.add(guid)
+            return True
+
+    def flush(self):
+        """
+        Wait for all submitted snapshots to be taken
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Take all submitted snapshots and stop the threads
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        """
+        Take submitted snapshots until closed
+        """
+        while True:
+            guid = self._queue.get()
+            try:
+                if guid is None:
+                    return
+                with self._lock:
+                    self._pending.discard(guid)
+                self._snapshot(guid)
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    "Could not snapshot %s", guid)
+            finally:
+                self._queue.task_done()
+
+    def _snapshot(self, guid):
+        """
+        Rebuild an aggregate root from the stores and snapshot it
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+        """
+        assert isinstance(guid, uuid.UUID)
+        repository = self.repository
+        root = (repository._rebuild_from_snapshot(guid)[0]
+                or repository._rebuild_from_event_store(guid)[0])
+        repository._update_children(root)
+        repository.snapshot_store.save(root)
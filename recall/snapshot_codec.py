@@ -0,0 +1,342 @@
+import abc
+import bz2
+import pickle
+import zlib
+
+import event_marshaler
+import models
+
+
+class _EntityState(tuple):
+    """
+    The state of a domain entity: its class id, guid, version and public
+    attributes
+    """
+    pass
+
+
+class _EntityListState(tuple):
+    """
+    The state of an :class:`recall.models.EntityList`: its class id and
+    (key, member) pairs
+    """
+    pass
+
+
+class _StateMarshaler(event_marshaler.BinaryEventMarshaler):
+    """
+    The binary format of :class:`recall.event_marshaler.BinaryEventMarshaler`,
+    extended with entity and entity list states
+    """
+    def __init__(self):
+        super(_StateMarshaler, self).__init__()
+        self._writers[_EntityState] = self._write_entity_state
+        self._writers[_EntityListState] = self._write_entity_list_state
+        self._readers["E"] = self._read_entity_state
+        self._readers["L"] = self._read_entity_list_state
+
+    def _write_entity_state(self, obj, chunks):
+        """
+        Write the state of an entity
+
+        :param obj: The value
+        :type obj: :class:`_EntityState`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("E")
+        self._write_list(obj, chunks)
+
+    def _write_entity_list_state(self, obj, chunks):
+        """
+        Write the state of an entity list
+
+        :param obj: The value
+        :type obj: :class:`_EntityListState`
+
+        :param chunks: The output chunks
+        :type chunks: :class:`list`
+        """
+        chunks.append("L")
+        self._write_list(obj, chunks)
+
+    def _read_entity_state(self, data, offset):
+        """
+        Read the state of an entity
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        values, offset = self._read(data, offset)
+        return _EntityState(values), offset
+
+    def _read_entity_list_state(self, data, offset):
+        """
+        Read the state of an entity list
+
+        :param data: The marshaled data
+        :type data: :class:`str`
+
+        :param offset: The offset of the value, following its tag
+        :type offset: :class:`int`
+
+        :rtype: :class:`tuple` of the value and the offset following it
+        """
+        values, offset = self._read(data, offset)
+        return _EntityListState(values), offset
+
+
+class SnapshotCodec(object):
+    """
+    The Snapshot Codec interface
+
+    A snapshot codec encodes aggregate roots to, and decodes them from, the
+    strings held by a snapshot store.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def encode(self, root):
+        """
+        Encode an aggregate root
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :rtype: :class:`str`
+        """
+        pass
+
+    @abc.abstractmethod
+    def decode(self, data):
+        """
+        Decode an aggregate root
+
+        :param data: The encoded aggregate root
+        :type data: :class:`str`
+
+        :rtype: :class:`recall.models.AggregateRoot`
+        """
+        pass
+
+
+class Pickle(SnapshotCodec):
+    """
+    Pickle the whole aggregate root object graph
+    """
+    def encode(self, root):
+        """
+        Encode an aggregate root
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :rtype: :class:`str`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        return pickle.dumps(root, pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data):
+        """
+        Decode an aggregate root
+
+        :param data: The encoded aggregate root
+        :type data: :class:`str`
+
+        :rtype: :class:`recall.models.AggregateRoot`
+        """
+        return pickle.loads(data)
+
+
+class State(SnapshotCodec):
+    """
+    Encode only the domain state of an aggregate root: the guid, version and
+    public attributes of each entity, recursively through child entities and
+    :class:`recall.models.EntityList` collections. Private attributes (such as
+    staged events) are not kept; each class's event handlers are stored once
+    per snapshot, by fqcn, rather than once per entity.
+
+    The state is written in the binary format of
+    :class:`recall.event_marshaler.BinaryEventMarshaler`, so public
+    attributes are limited to the values it supports, and can optionally be
+    compressed.
+
+    :param compression: The compression, ``zlib``, ``bz2``, or None
+    :type compression: :class:`str`
+
+    :param level: The compression level
+    :type level: :class:`int`
+    """
+    COMPRESSORS = {
+        None: ("-", lambda data, level: data),
+        "zlib": ("z", zlib.compress),
+        "bz2": ("b", bz2.compress)}
+    DECOMPRESSORS = {
+        "-": lambda data: data,
+        "z": zlib.decompress,
+        "b": bz2.decompress}
+
+    def __init__(self, compression="zlib", level=6):
+        assert compression in self.COMPRESSORS
+        assert isinstance(level, int)
+        self.compression = compression
+        self.level = level
+        self._marshaler = _StateMarshaler()
+        self._classes = {}
+
+    def encode(self, root):
+        """
+        Encode an aggregate root
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :rtype: :class:`str`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        classes = {}
+        state = self._encode_value(root, classes)
+        fqcns = [None] * len(classes)
+        handlers = {}
+        for cls, (class_id, handler_map) in classes.items():
+            fqcns[class_id] = self._get_fqcn(cls)
+            handlers[class_id] = [
+                [self._get_fqcn(k), self._get_fqcn(v)]
+                for k, v in handler_map.items()]
+
+        tag, compress = self.COMPRESSORS[self.compression]
+        return tag + compress(
+            self._marshaler.dumps([fqcns, handlers, state]),
+            self.level)
+
+    def decode(self, data):
+        """
+        Decode an aggregate root
+
+        :param data: The encoded aggregate root
+        :type data: :class:`str`
+
+        :rtype: :class:`recall.models.AggregateRoot`
+        """
+        fqcns, handlers, state = self._marshaler.loads(
+            self.DECOMPRESSORS[data[0]](data[1:]))
+        classes = [self._get_class(fqcn) for fqcn in fqcns]
+        handler_maps = dict(
+            (class_id, dict(
+                (self._get_class(k), self._get_class(v)) for k, v in pairs))
+            for class_id, pairs in handlers.items())
+        return self._decode_value(state, classes, handler_maps)
+
+    def _encode_value(self, value, classes):
+        """
+        Convert an attribute value to the structure written to the snapshot
+
+        :param value: The attribute value
+        :type value: :class:`object`
+
+        :param classes: The ids and handlers of the entity classes seen so far
+        :type classes: :class:`dict`
+
+        :rtype: :class:`object`
+        """
+        if isinstance(value, models.Entity):
+            if value.__class__ not in classes:
+                classes[value.__class__] = (len(classes), value._handlers)
+            return _EntityState([
+                classes[value.__class__][0],
+                value.guid,
+                value._version,
+                dict((k, self._encode_value(v, classes))
+                     for k, v in value.__dict__.items()
+                     if not k.startswith("_") and k != "guid")])
+        if isinstance(value, models.EntityList):
+            if value.__class__ not in classes:
+                classes[value.__class__] = (len(classes), {})
+            return _EntityListState([
+                classes[value.__class__][0],
+                [[k, self._encode_value(v, classes)]
+                 for k, v in value.items()]])
+        if isinstance(value, (list, tuple)):
+            return [self._encode_value(v, classes) for v in value]
+        if isinstance(value, dict):
+            return dict(
+                (k, self._encode_value(v, classes)) for k, v in value.items())
+        return value
+
+    def _decode_value(self, value, classes, handler_maps):
+        """
+        Convert a structure read from the snapshot to an attribute value
+
+        :param value: The structure
+        :type value: :class:`object`
+
+        :param classes: The entity classes, by id
+        :type classes: :class:`list`
+
+        :param handler_maps: The event handlers of the entity classes, by id
+        :type handler_maps: :class:`dict`
+
+        :rtype: :class:`object`
+        """
+        if isinstance(value, _EntityState):
+            class_id, guid, version, state = value
+            cls = classes[class_id]
+            entity = cls.__new__(cls)
+            models.Entity.__init__(entity)
+            entity._handlers = dict(handler_maps.get(class_id, {}))
+            entity.guid = guid
+            entity._version = version
+            for k, v in state.items():
+                setattr(entity, k, self._decode_value(
+                    v, classes, handler_maps))
+            return entity
+        if isinstance(value, _EntityListState):
+            class_id, items = value
+            collection = classes[class_id]()
+            for k, v in items:
+                collection[k] = self._decode_value(v, classes, handler_maps)
+            return collection
+        if isinstance(value, list):
+            return [self._decode_value(v, classes, handler_maps)
+                    for v in value]
+        if isinstance(value, dict):
+            return dict(
+                (k, self._decode_value(v, classes, handler_maps))
+                for k, v in value.items())
+        return value
+
+    def _get_fqcn(self, cls):
+        """
+        Get the fully-qualified name of a class
+
+        :param cls: The class
+        :type cls: :class:`type`
+
+        :rtype: :class:`str`
+        """
+        return ".".join([cls.__module__, cls.__name__])
+
+    def _get_class(self, fqcn):
+        """
+        Get a class by its fully-qualified name, importing it the first time
+
+        :param fqcn: The fully-qualified class name
+        :type fqcn: :class:`str`
+
+        :rtype: :class:`type`
+        """
+        cls = self._classes.get(fqcn)
+        if cls is None:
+            class_name = fqcn.split(".")[-1]
+            module_name = ".".join(fqcn.split(".")[0:-1])
+            mdl = __import__(module_name, globals(), locals(), [class_name], 0)
+            if class_name not in dir(mdl):
+                raise NameError("Could not instantiate %s" % fqcn)
+            cls = self._classes[fqcn] = getattr(mdl, class_name)
+        return cls
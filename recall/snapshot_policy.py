@@ -0,0 +1,251 @@
+import abc
+import collections
+import threading
+import uuid
+
+import models
+
+
+class SnapshotPolicy(object):
+    """
+    The Snapshot Policy interface
+
+    A snapshot policy decides, after each save of an aggregate root, whether
+    the repository should take a snapshot of it. Policies are told about
+    every load (including how many events were replayed and how long it
+    took) and every snapshot, so they can spend snapshots where they save
+    the most load time. The repository may call a policy from several
+    threads, so policies which keep state must guard it with a lock.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    def loaded(self, root, events, seconds):
+        """
+        Record the replay of an aggregate root from a snapshot or the event
+        stream
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :param events: The number of events replayed
+        :type events: :class:`int`
+
+        :param seconds: The time taken to load the root
+        :type seconds: :class:`float`
+        """
+        pass
+
+    @abc.abstractmethod
+    def should_snapshot(self, root, events):
+        """
+        Decide whether to snapshot an aggregate root which has just been saved
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :param events: The number of events committed by the save
+        :type events: :class:`int`
+
+        :rtype: :class:`bool`
+        """
+        pass
+
+    def snapshotted(self, root):
+        """
+        Record that a snapshot of an aggregate root has been taken
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+        """
+        pass
+
+    def _remember(self, table, guid, value):
+        """
+        Record the state of an aggregate root as the most recently used one,
+        forgetting the least recently used roots beyond ``max_roots``
+
+        :param table: The states of the aggregate roots, by guid
+        :type table: :class:`collections.OrderedDict`
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :param value: The state of the aggregate root
+        :type value: :class:`object`
+        """
+        table.pop(guid, None)
+        table[guid] = value
+        while len(table) > self.max_roots:
+            table.popitem(last=False)
+
+
+class EventCount(SnapshotPolicy):
+    """
+    Snapshot an aggregate root once at least ``frequency`` events have been
+    committed since its last snapshot (or since it was loaded, counting the
+    events replayed after its snapshot). Unlike checking whether the version
+    is a multiple of the frequency, a save committing several events can't
+    skip over a snapshot. Counts are kept for the ``max_roots`` most recently
+    used roots only.
+
+    :param frequency: The number of events between snapshots
+    :type frequency: :class:`int`
+
+    :param max_roots: The maximum number of roots to keep counts for
+    :type max_roots: :class:`int`
+    """
+    def __init__(self, frequency=10, max_roots=100000):
+        assert isinstance(frequency, int) and frequency > 0
+        assert isinstance(max_roots, int) and max_roots > 0
+        self.frequency = frequency
+        self.max_roots = max_roots
+        self._events = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def loaded(self, root, events, seconds):
+        """
+        Record the replay of an aggregate root from a snapshot or the event
+        stream
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :param events: The number of events replayed
+        :type events: :class:`int`
+
+        :param seconds: The time taken to load the root
+        :type seconds: :class:`float`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        with self._lock:
+            self._remember(self._events, root.guid, events)
+
+    def should_snapshot(self, root, events):
+        """
+        Decide whether to snapshot an aggregate root which has just been saved
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :param events: The number of events committed by the save
+        :type events: :class:`int`
+
+        :rtype: :class:`bool`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        assert isinstance(events, int)
+        with self._lock:
+            events += self._events.get(root.guid, 0)
+            self._remember(self._events, root.guid, events)
+        return events >= self.frequency
+
+    def snapshotted(self, root):
+        """
+        Record that a snapshot of an aggregate root has been taken
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        with self._lock:
+            self._events.pop(root.guid, None)
+
+
+class ReplayCost(SnapshotPolicy):
+    """
+    Snapshot an aggregate root once replaying the events committed since its
+    last snapshot is estimated to take at least ``threshold`` seconds.
+
+    The estimate is the number of events since the last snapshot, times the
+    time per event measured in the most recent replay of the root (or, for a
+    root which hasn't been replayed yet, averaged over all replays so far).
+    Counts and times are kept for the ``max_roots`` most recently used roots
+    only.
+
+    :param threshold: The replay time (in seconds) worth a snapshot
+    :type threshold: :class:`float`
+
+    :param max_roots: The maximum number of roots to keep counts and times for
+    :type max_roots: :class:`int`
+    """
+    def __init__(self, threshold=0.05, max_roots=100000):
+        assert isinstance(threshold, (int, float)) and threshold > 0
+        assert isinstance(max_roots, int) and max_roots > 0
+        self.threshold = threshold
+        self.max_roots = max_roots
+        self._roots = collections.OrderedDict()
+        self._replayed_events = 0
+        self._replayed_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def loaded(self, root, events, seconds):
+        """
+        Record the replay of an aggregate root from a snapshot or the event
+        stream
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :param events: The number of events replayed
+        :type events: :class:`int`
+
+        :param seconds: The time taken to load the root
+        :type seconds: :class:`float`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        with self._lock:
+            cost = self._roots.get(root.guid, (0, None))[1]
+            if events:
+                cost = seconds / events
+                self._replayed_events += events
+                self._replayed_seconds += seconds
+            self._remember(self._roots, root.guid, (events, cost))
+
+    def should_snapshot(self, root, events):
+        """
+        Decide whether to snapshot an aggregate root which has just been saved
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+
+        :param events: The number of events committed by the save
+        :type events: :class:`int`
+
+        :rtype: :class:`bool`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        assert isinstance(events, int)
+        with self._lock:
+            previous, cost = self._roots.get(root.guid, (0, None))
+            events += previous
+            self._remember(self._roots, root.guid, (events, cost))
+            return events * self._get_cost(root.guid) >= self.threshold
+
+    def snapshotted(self, root):
+        """
+        Record that a snapshot of an aggregate root has been taken
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        with self._lock:
+            state = self._roots.get(root.guid)
+            if state:
+                self._roots[root.guid] = (0, state[1])
+
+    def _get_cost(self, guid):
+        """
+        Get the estimated time to replay a single event of an aggregate root
+        (called with the lock held)
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`float`
+        """
+        assert isinstance(guid, uuid.UUID)
+        cost = self._roots.get(guid, (0, None))[1]
+        if cost is None and self._replayed_events:
+            cost = self._replayed_seconds / self._replayed_events
+        return cost or 0.0
@@ -1,8 +1,15 @@
 import abc
+import collections
+import errno
+import logging
+import os
 import pickle
+import tempfile
+import threading
 import uuid
 
 import models
+import snapshot_codec
 
 
 class SnapshotStore(object):
@@ -30,6 +37,19 @@ class SnapshotStore(object):
         """
         pass
 
+    def load_many(self, guids):
+        """
+        Load many aggregate roots from their snapshots
+
+        :param guids: The guids of the aggregate roots
+        :type guids: :class:`collections.Iterable`
+
+        :rtype: :class:`dict`
+        """
+        assert isinstance(guids, collections.Iterable)
+        roots = ((guid, self.load(guid)) for guid in guids)
+        return dict((guid, root) for guid, root in roots if root)
+
     @abc.abstractmethod
     def save(self, root):
         """
@@ -43,9 +63,16 @@ class SnapshotStore(object):
 
 class Memory(SnapshotStore):
     """
-    An in-memory :class:`dict` of pickled roots as the snapshot store.
+    An in-memory :class:`dict` of encoded (by default, pickled) roots as the
+    snapshot store.
+
+    :param codec: The snapshot codec
+    :type codec: :class:`recall.snapshot_codec.SnapshotCodec`
     """
-    def __init__(self):
+    def __init__(self, codec=None):
+        assert (isinstance(codec, snapshot_codec.SnapshotCodec)
+                or codec is None)
+        self.codec = codec or snapshot_codec.Pickle()
         self._snapshots = {}
 
     def load(self, guid):
@@ -59,7 +86,7 @@ class Memory(SnapshotStore):
         """
         assert isinstance(guid, uuid.UUID)
         snapshot = self._snapshots.get(guid)
-        return pickle.loads(snapshot) if snapshot else None
+        return self.codec.decode(snapshot) if snapshot else None
 
     def save(self, root):
         """
@@ -69,4 +96,401 @@ class Memory(SnapshotStore):
         :type root: :class:`recall.models.AggregateRoot`
         """
         assert isinstance(root, models.AggregateRoot)
-        self._snapshots[root.guid] = pickle.dumps(root)
\ No newline at end of file
+        self._snapshots[root.guid] = self.codec.encode(root)
+
+
+class File(SnapshotStore):
+    """
+    A durable snapshot store of encoded (by default, pickled) roots, one file
+    per snapshot, stored under a directory per aggregate root and named by
+    version.
+
+    Snapshots are written to a temporary file and renamed into place, so a
+    snapshot is never read half-written. With ``fsync``, the file and its
+    directory are also synced, so a snapshot survives a crash once saved.
+    Without it, the newest snapshot may be lost or torn by a crash: a
+    snapshot which can't be decoded is skipped in favour of the previous one
+    (or of the event stream). Only the newest ``keep`` snapshots of each root
+    are kept; older ones are removed by a background compaction thread after
+    each save.
+
+    :param path: The directory holding the snapshots
+    :type path: :class:`str`
+
+    :param keep: The number of snapshots to keep per aggregate root
+    :type keep: :class:`int`
+
+    :param codec: The snapshot codec
+    :type codec: :class:`recall.snapshot_codec.SnapshotCodec`
+
+    :param fsync: Whether to fsync snapshots on save
+    :type fsync: :class:`bool`
+    """
+    SNAPSHOT_NAME = "%020d.snapshot"
+    SNAPSHOT_SUFFIX = ".snapshot"
+
+    def __init__(self, path, keep=3, codec=None, fsync=False):
+        assert isinstance(path, (str, unicode))
+        assert isinstance(keep, int) and keep > 0
+        assert (isinstance(codec, snapshot_codec.SnapshotCodec)
+                or codec is None)
+        assert isinstance(fsync, bool)
+        self.path = path
+        self.keep = keep
+        self.codec = codec or snapshot_codec.Pickle()
+        self.fsync = fsync
+        self._latest = {}
+        self._pending = set()
+        self._closed = False
+        self._condition = threading.Condition()
+        self._compactor = threading.Thread(target=self._compact_pending)
+        self._compactor.daemon = True
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._compactor.start()
+
+    def load(self, guid):
+        """
+        Load an aggregate root from its newest readable snapshot
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`recall.models.AggregateRoot`
+        """
+        assert isinstance(guid, uuid.UUID)
+        version = self._latest.get(guid)
+        if version is not None:
+            root = self._read(guid, version)
+            if root is not None:
+                return root
+            # Compacted away by a newer snapshot from another writer, or torn
+            self._latest.pop(guid, None)
+
+        for version in reversed(self._get_versions(guid)):
+            root = self._read(guid, version)
+            if root is not None:
+                return root
+        return None
+
+    def save(self, root):
+        """
+        Take a snapshot of an aggregate root
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        directory = os.path.dirname(self._snapshot_path(root.guid, 0))
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(self.codec.encode(root))
+            fp.flush()
+            if self.fsync:
+                os.fsync(fp.fileno())
+        os.rename(temp_path, self._snapshot_path(root.guid, root._version))
+        if self.fsync:
+            self._sync_directory(directory)
+
+        if root._version >= self._latest.get(root.guid, 0):
+            self._latest[root.guid] = root._version
+        with self._condition:
+            self._pending.add(root.guid)
+            self._condition.notify()
+
+    def compact(self, guid):
+        """
+        Remove all but the newest ``keep`` snapshots of an aggregate root
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+        """
+        assert isinstance(guid, uuid.UUID)
+        for version in self._get_versions(guid)[:-self.keep]:
+            try:
+                os.remove(self._snapshot_path(guid, version))
+            except OSError:
+                pass
+
+    def close(self):
+        """
+        Compact any pending aggregate roots and stop the compaction thread
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._compactor.join()
+
+    def _compact_pending(self):
+        """
+        Compact aggregate roots as they are saved, until closed
+        """
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                pending, self._pending = self._pending, set()
+                closed = self._closed
+
+            for guid in pending:
+                self.compact(guid)
+            if closed:
+                return
+
+    def _read(self, guid, version):
+        """
+        Read and decode a snapshot of an aggregate root
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :param version: The version of the aggregate root
+        :type version: :class:`int`
+
+        :rtype: :class:`recall.models.AggregateRoot`, or ``None`` if the
+            snapshot is missing or can't be decoded
+        """
+        path = self._snapshot_path(guid, version)
+        try:
+            with open(path, "rb") as fp:
+                data = fp.read()
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+        try:
+            return self.codec.decode(data)
+        except Exception:
+            logging.getLogger(__name__).exception(
+                "Could not decode snapshot %s, skipping it", path)
+            return None
+
+    def _sync_directory(self, directory):
+        """
+        Fsync a directory, so that the files renamed into it are persisted
+
+        :param directory: The directory
+        :type directory: :class:`str`
+        """
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _get_versions(self, guid):
+        """
+        Get the versions of the stored snapshots of an aggregate root, oldest
+        first
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`list`
+        """
+        try:
+            names = os.listdir(os.path.join(self.path, guid.hex))
+        except OSError:
+            return []
+
+        return sorted(
+            int(name[:-len(self.SNAPSHOT_SUFFIX)]) for name in names
+            if name.endswith(self.SNAPSHOT_SUFFIX))
+
+    def _snapshot_path(self, guid, version):
+        """
+        Get the path of a snapshot file
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :param version: The version of the aggregate root
+        :type version: :class:`int`
+
+        :rtype: :class:`str`
+        """
+        return os.path.join(
+            self.path,
+            guid.hex,
+            self.SNAPSHOT_NAME % version)
+
+
+class _Reference(object):
+    """
+    A reference to a domain entity by guid, standing in for the entity in
+    the state of its parent in a delta snapshot.
+
+    :param guid: The guid of the domain entity
+    :type guid: :class:`uuid.UUID`
+    """
+    def __init__(self, guid):
+        self.guid = guid
+
+
+class _ListReference(object):
+    """
+    A reference to an :class:`recall.models.EntityList`, standing in for the
+    collection in the state of its parent in a delta snapshot.
+
+    :param cls: The class of the collection
+    :type cls: :class:`type`
+
+    :param items: The (referenced) members of the collection, by key
+    :type items: :class:`dict`
+    """
+    def __init__(self, cls, items):
+        self.cls = cls
+        self.items = items
+
+
+class Delta(SnapshotStore):
+    """
+    An in-memory snapshot store of full (base) snapshots plus deltas.
+
+    Once a root has a base snapshot, each following snapshot only records the
+    entities whose version changed since the previous snapshot (or which are
+    new), each without its child entities, which are stored as references.
+    Loading decodes the base and then applies the deltas in order, and
+    re-attaches the rebuilt entity graph to the root. After
+    ``max_deltas`` deltas, the next snapshot is a full one again, which keeps
+    loads bounded. Full snapshots are encoded with the codec (by default,
+    pickled), while deltas are always pickled.
+
+    :param max_deltas: The number of deltas taken between full snapshots
+    :type max_deltas: :class:`int`
+
+    :param codec: The snapshot codec of full snapshots
+    :type codec: :class:`recall.snapshot_codec.SnapshotCodec`
+    """
+    def __init__(self, max_deltas=10, codec=None):
+        assert isinstance(max_deltas, int) and max_deltas >= 0
+        assert (isinstance(codec, snapshot_codec.SnapshotCodec)
+                or codec is None)
+        self.max_deltas = max_deltas
+        self.codec = codec or snapshot_codec.Pickle()
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def load(self, guid):
+        """
+        Load an aggregate root from its base snapshot and deltas
+
+        :param guid: The guid of the aggregate root
+        :type guid: :class:`uuid.UUID`
+
+        :rtype: :class:`recall.models.AggregateRoot`
+        """
+        assert isinstance(guid, uuid.UUID)
+        snapshot = self._snapshots.get(guid)
+        if not snapshot:
+            return None
+
+        base, _, deltas = snapshot
+        root = self.codec.decode(base)
+        entities = dict((x.guid, x) for x in root._get_all_entities())
+        changed = []
+        for delta in deltas:
+            for cls, state in pickle.loads(delta):
+                entity = entities.get(state["guid"])
+                if entity is None:
+                    entity = cls.__new__(cls)
+                    entities[state["guid"]] = entity
+                entity.__dict__ = state
+                changed.append(entity)
+
+        for entity in changed:
+            for key, value in entity.__dict__.items():
+                entity.__dict__[key] = self._resolve(value, entities)
+
+        if changed:
+            root._set_root(root)
+        return root
+
+    def save(self, root):
+        """
+        Take a full or a delta snapshot of an aggregate root
+
+        :param root: The aggregate root
+        :type root: :class:`recall.models.AggregateRoot`
+        """
+        assert isinstance(root, models.AggregateRoot)
+        entities = list(root._get_all_entities())
+        with self._lock:
+            snapshot = self._snapshots.get(root.guid)
+            if not snapshot or len(snapshot[2]) >= self.max_deltas:
+                self._snapshots[root.guid] = (
+                    self.codec.encode(root),
+                    dict((x.guid, x._version) for x in entities),
+                    [])
+                return
+
+            base, versions, deltas = snapshot
+            versions = dict(versions)
+            changed = [x for x in entities
+                       if versions.get(x.guid) != x._version]
+            delta = pickle.dumps(
+                [(x.__class__, self._get_state(x)) for x in changed],
+                pickle.HIGHEST_PROTOCOL)
+            versions.update((x.guid, x._version) for x in changed)
+            self._snapshots[root.guid] = (base, versions, deltas + [delta])
+
+    def _get_state(self, entity):
+        """
+        Get the state of a domain entity, with child entities replaced by
+        references
+
+        :param entity: The domain entity
+        :type entity: :class:`recall.models.Entity`
+
+        :rtype: :class:`dict`
+        """
+        assert isinstance(entity, models.Entity)
+        return dict(
+            (k, self._reference(v)) for k, v in entity.__dict__.items())
+
+    def _reference(self, value):
+        """
+        Replace a child entity, or a collection of them, by a reference
+
+        :param value: An attribute value of a domain entity
+        :type value: :class:`object`
+
+        :rtype: :class:`object`
+        """
+        if isinstance(value, models.Entity):
+            return _Reference(value.guid)
+        if isinstance(value, models.EntityList):
+            return _ListReference(value.__class__, dict(
+                (k, self._reference(v)) for k, v in value.items()))
+        return value
+
+    def _resolve(self, value, entities):
+        """
+        Replace a reference by the child entity, or collection, it refers to
+
+        :param value: An attribute value of a domain entity
+        :type value: :class:`object`
+
+        :param entities: The domain entities of the aggregate, by guid
+        :type entities: :class:`dict`
+
+        :rtype: :class:`object`
+        """
+        if isinstance(value, _Reference):
+            return entities[value.guid]
+        if isinstance(value, _ListReference):
+            collection = value.cls()
+            for k, v in value.items.items():
+                collection[k] = self._resolve(v, entities)
+            return collection
+        return value
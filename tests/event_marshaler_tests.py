@@ -0,0 +1,130 @@
+import datetime
+import unittest
+import uuid
+
+import recall.event_marshaler as em
+import recall.models as m
+
+
+class MockEvent(m.Event):
+    def require(self, guid, occurred, tags):
+        assert isinstance(guid, uuid.UUID)
+        assert isinstance(occurred, datetime.datetime)
+
+
+class OtherEvent(m.Event):
+    def require(self, name):
+        pass
+
+
+class DefaultEventMarshalerTest(unittest.TestCase):
+    def setUp(self):
+        self.event = MockEvent(
+            guid=uuid.uuid4(),
+            occurred=datetime.datetime(2013, 5, 1, 12, 30, 15, 250),
+            tags=["a", {"nested": uuid.uuid4()}])
+
+    def test_round_trip(self):
+        marshaler = em.DefaultEventMarshaler()
+        marshaled = marshaler.marshal(self.event)
+
+        self.assertEqual(
+            "tests.event_marshaler_tests.MockEvent",
+            marshaled["__type__"])
+        self.assertEqual(
+            {"__uuid__": True, "uuid": str(self.event["guid"])},
+            marshaled["data"]["guid"])
+        self.assertEqual(self.event, marshaler.unmarshal(marshaled))
+
+    def test_round_trips_whole_second_datetimes_and_dates(self):
+        marshaler = em.DefaultEventMarshaler()
+        events = [
+            MockEvent(
+                guid=uuid.uuid4(),
+                occurred=datetime.datetime(2020, 1, 1),
+                tags=[datetime.date(2020, 1, 1)])
+            for _ in range(2)]
+        marshaled = [marshaler.marshal(x) for x in events]
+
+        self.assertEqual(events[0], marshaler.unmarshal(marshaled[0]))
+        self.assertEqual(events, list(marshaler.unmarshal_many(marshaled)))
+        self.assertIs(
+            datetime.date, type(marshaler.unmarshal(marshaled[0])["tags"][0]))
+
+        marshaled[0]["data"]["occurred"]["datetime"] = "2020-01-01T00:00:00"
+        self.assertEqual(events[0], marshaler.unmarshal(marshaled[0]))
+
+    def test_caches_event_classes(self):
+        marshaler = em.DefaultEventMarshaler()
+        marshaled = em.DefaultEventMarshaler().marshal(self.event)
+        marshaler.unmarshal(marshaled)
+
+        self.assertIs(
+            MockEvent,
+            marshaler._classes["tests.event_marshaler_tests.MockEvent"])
+        self.assertRaises(
+            NameError,
+            marshaler.unmarshal,
+            {"__type__": "tests.event_marshaler_tests.Missing", "data": {}})
+
+    def test_unmarshal_many_decodes_runs_of_events(self):
+        marshaler = em.DefaultEventMarshaler()
+        other = OtherEvent(name="x")
+        events = [
+            self.event,
+            MockEvent(
+                guid=uuid.uuid4(),
+                occurred=datetime.datetime(2013, 5, 2, 0, 0, 0, 1),
+                tags=None),
+            other,
+            self.event]
+
+        self.assertEqual(
+            events,
+            list(marshaler.unmarshal_many(
+                marshaler.marshal(x) for x in events)))
+
+    def test_trusted_marshaler_skips_require(self):
+        marshaler = em.DefaultEventMarshaler(trusted=True)
+        marshaled = marshaler.marshal(self.event)
+        marshaled["data"]["occurred"] = "not validated"
+
+        events = [marshaler.unmarshal(marshaled)]
+        events.extend(marshaler.unmarshal_many([marshaled, marshaled]))
+        for event in events:
+            self.assertEqual("not validated", event["occurred"])
+            self.assertEqual(self.event["guid"], event["guid"])
+            self.assertEqual(self.event["tags"], event["tags"])
+        self.assertRaises(
+            AssertionError,
+            em.DefaultEventMarshaler().unmarshal, marshaled)
+
+
+class BinaryEventMarshalerTest(unittest.TestCase):
+    def setUp(self):
+        self.event = MockEvent(
+            guid=uuid.uuid4(),
+            occurred=datetime.datetime(2013, 5, 1, 12, 30, 15),
+            tags=[None, True, 1, 2 ** 80, 1.5, "a", u"\xe9",
+                  datetime.date(2013, 5, 1), {"nested": ["b" * 300]}])
+
+    def test_round_trip(self):
+        marshaler = em.BinaryEventMarshaler({1: MockEvent})
+        marshaled = marshaler.marshal(self.event)
+        event = marshaler.unmarshal(marshaled)
+
+        self.assertIsInstance(marshaled, str)
+        self.assertEqual(self.event, event)
+        self.assertIsInstance(event["tags"][3], long)
+        self.assertIsInstance(event["tags"][6], unicode)
+        self.assertLess(
+            len(marshaled),
+            len(repr(em.DefaultEventMarshaler().marshal(self.event))))
+
+    def test_requires_registered_types(self):
+        marshaler = em.BinaryEventMarshaler()
+        self.assertRaises(NameError, marshaler.marshal, self.event)
+        self.assertRaises(
+            NameError,
+            marshaler.unmarshal,
+            em.BinaryEventMarshaler({1: MockEvent}).marshal(self.event))
@@ -0,0 +1,217 @@
+import os
+import Queue
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+
+import recall.event_router as er
+import recall.event_store as es
+import recall.models as m
+
+
+class MockEvent(m.Event):
+    def require(self, number, guid=None):
+        assert isinstance(number, int)
+
+
+class MockRoot(m.AggregateRoot):
+    @m.handles(MockEvent)
+    def _when_numbered(self, event):
+        self.guid = event["guid"]
+
+    def number(self, number):
+        self._apply_event(
+            MockEvent(number=number, guid=self.guid or uuid.uuid4()))
+
+
+def _save(store, *numbers):
+    root = MockRoot()
+    for number in numbers:
+        root.number(number)
+    store.save(root)
+    return root
+
+
+class BatchingTest(unittest.TestCase):
+    def test_delivers_events_in_order_and_in_batches(self):
+        batches = []
+        router = er.Batching([batches.append], batch_size=3)
+        router.route_all(uuid.uuid4(), [MockEvent(number=x) for x in range(7)])
+        router.close()
+
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+        self.assertEqual(
+            range(7), [x["number"] for batch in batches for x in batch])
+
+    def test_blocks_writers_when_the_backlog_is_full(self):
+        release = threading.Event()
+        router = er.Batching(
+            [lambda events: release.wait()], batch_size=1, backlog=1)
+        router.route(MockEvent(number=0))
+        router.route(MockEvent(number=1))
+        router.timeout = 0.05
+
+        self.assertRaises(Queue.Full, router.route, MockEvent(number=2))
+        release.set()
+        router.close()
+
+    def test_keeps_delivering_after_a_subscriber_fails(self):
+        batches = []
+
+        def fail(events):
+            raise ValueError()
+
+        router = er.Batching([fail, batches.append])
+        router.route(MockEvent(number=0))
+        router.flush()
+        router.route(MockEvent(number=1))
+        router.close()
+
+        self.assertEqual(
+            [0, 1], [x["number"] for batch in batches for x in batch])
+
+
+class OtherEvent(MockEvent):
+    pass
+
+
+class FanOutTest(unittest.TestCase):
+    def test_keeps_events_of_an_aggregate_in_order(self):
+        received = {}
+        lock = threading.Lock()
+
+        def record(event):
+            with lock:
+                received.setdefault(event["guid"], []).append(event["number"])
+
+        router = er.FanOut(partitions=3)
+        router.subscribe(OtherEvent, record)
+        guids = [uuid.uuid4() for _ in range(10)]
+        for number in range(20):
+            for guid in guids:
+                router.route_all(guid, [
+                    OtherEvent(guid=guid, number=number),
+                    MockEvent(guid=guid, number=-1)])
+        router.close()
+
+        self.assertEqual(dict((x, range(20)) for x in guids), received)
+
+    def test_delivers_to_subscribers_of_base_classes(self):
+        received = []
+        router = er.FanOut(partitions=2)
+        router.subscribe(MockEvent, received.append)
+        router.subscribe(OtherEvent, received.append)
+        router.route(OtherEvent(guid=uuid.uuid4(), number=1))
+        router.flush()
+
+        self.assertEqual(2, len(received))
+        self.assertEqual([(0, 0.0), (0, 0.0)], router.get_lag())
+        router.close()
+
+    def test_reports_the_lag_of_a_blocked_subscriber(self):
+        entered = threading.Event()
+        release = threading.Event()
+
+        def block(event):
+            entered.set()
+            release.wait()
+
+        router = er.FanOut(partitions=1)
+        router.subscribe(MockEvent, block)
+        guid = uuid.uuid4()
+        router.route_all(guid, [MockEvent(guid=guid, number=x) for x in (1, 2)])
+        router.route(MockEvent(guid=guid, number=3))
+        entered.wait()
+        time.sleep(0.05)
+
+        [(events, seconds)] = router.get_lag()
+        self.assertEqual(3, events)
+        self.assertGreaterEqual(seconds, 0.05)
+
+        release.set()
+        router.flush()
+        self.assertEqual([(0, 0.0)], router.get_lag())
+        router.close()
+
+
+class OutboxTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_delivers_spooled_events_and_empties_the_spool(self):
+        batches = []
+        router = er.Outbox(self.path, [batches.append], batch_size=2)
+        router.route_all(uuid.uuid4(), [MockEvent(number=x) for x in range(5)])
+        router.flush()
+        router.close()
+
+        self.assertEqual(
+            range(5), [x["number"] for batch in batches for x in batch])
+        self.assertEqual(
+            0, os.path.getsize(os.path.join(self.path, "spool")))
+
+    def test_redelivers_undelivered_events_after_a_restart(self):
+        def fail(events):
+            raise ValueError()
+
+        router = er.Outbox(self.path, [fail], retry_interval=0.01)
+        router.route(MockEvent(number=1))
+        router.close()
+        with open(os.path.join(self.path, "spool"), "ab") as fp:
+            fp.write("\x00\x00\x01")
+
+        batches = []
+        router = er.Outbox(self.path, [batches.append])
+        router.route(MockEvent(number=2))
+        router.flush()
+        router.close()
+
+        self.assertEqual(
+            [1, 2], [x["number"] for batch in batches for x in batch])
+
+
+    def test_compacts_the_spool_while_delivering(self):
+        spool = os.path.join(self.path, "spool")
+        sizes = []
+        delivered = []
+
+        def record(events):
+            sizes.append(os.path.getsize(spool))
+            delivered.extend(x["number"] for x in events)
+
+        router = er.Outbox(
+            self.path, [record], batch_size=1, compact_size=1)
+        router.route_all(uuid.uuid4(), [MockEvent(number=x) for x in range(3)])
+        router.flush()
+        router.close()
+
+        self.assertEqual([0, 1, 2], delivered)
+        self.assertEqual(sizes[0] / 3, sizes[2])
+
+    def test_delivers_stored_events_which_were_never_routed(self):
+        store = es.Memory()
+        _save(store, 1, 2)
+
+        batches = []
+        router = er.Outbox(
+            self.path, [batches.append], batch_size=2, event_store=store)
+        router.flush()
+        root = _save(store, 3)
+        router.route_all(root.guid, list(root.get_all_events()))
+        router.flush()
+        router.close()
+        self.assertFalse(os.path.exists(os.path.join(self.path, "spool")))
+
+        _save(store, 4)
+        router = er.Outbox(self.path, [batches.append], event_store=store)
+        router.flush()
+        router.close()
+
+        self.assertEqual(
+            [1, 2, 3, 4], [x["number"] for batch in batches for x in batch])
@@ -0,0 +1,243 @@
+import shutil
+import tempfile
+import threading
+import unittest
+import uuid
+
+import recall.event_marshaler as em
+import recall.event_store as es
+import recall.models as m
+
+
+class MockEvent(m.Event):
+    def require(self, guid, name):
+        assert isinstance(guid, uuid.UUID)
+        assert isinstance(name, str)
+
+
+class MockEntity(m.Entity):
+    def __init__(self):
+        super(MockEntity, self).__init__()
+        self.guid = self._create_guid()
+
+    def rename(self, name):
+        self._apply_event(MockEvent(guid=self.guid, name=name))
+
+
+class MockRoot(m.AggregateRoot):
+    def __init__(self):
+        super(MockRoot, self).__init__()
+        self.guid = self._create_guid()
+        self.children = m.EntityList()
+
+    def rename(self, name):
+        self._apply_event(MockEvent(guid=self.guid, name=name))
+
+
+def _save(store, entity):
+    store.save(entity)
+    for provider in entity._get_all_entities():
+        provider._increment_version(len(provider._events))
+        provider._clear_events()
+
+
+class MemoryEventStoreTest(unittest.TestCase):
+    def test_save_checks_expected_version(self):
+        store = es.Memory()
+        root = MockRoot()
+        root.rename("a")
+        _save(store, root)
+
+        stale = MockRoot()
+        stale.guid = root.guid
+        stale.rename("b")
+        self.assertRaises(es.ConcurrencyError, store.save, stale)
+
+        root.rename("c")
+        _save(store, root)
+        self.assertEqual(
+            ["a", "c"],
+            [e["name"] for e in store.get_all_events(root.guid)])
+
+
+class FileEventStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_reads_stream_from_version(self):
+        store = es.File(self.path)
+        root = MockRoot()
+        child = MockEntity()
+        root.children.add(child)
+        for name in ("a", "b", "c"):
+            root.rename(name)
+        child.rename("x")
+        _save(store, root)
+
+        self.assertEqual(
+            ["a", "b", "c"],
+            [e["name"] for e in store.get_all_events(root.guid)])
+        self.assertEqual(
+            ["c"],
+            [e["name"] for e in store.get_events_from_version(root.guid, 2)])
+        self.assertEqual(
+            ["x"],
+            [e["name"] for e in store.get_all_events(child.guid)])
+        self.assertEqual([], list(store.get_all_events(uuid.uuid4())))
+
+    def test_save_checks_expected_version(self):
+        store = es.File(self.path)
+        root = MockRoot()
+        root.rename("a")
+        _save(store, root)
+        root._version = 0
+        root.rename("b")
+
+        self.assertRaises(es.ConcurrencyError, store.save, root)
+        self.assertEqual(1, len(store._streams[root.guid]))
+
+    def test_reads_do_not_wait_for_saves(self):
+        store = es.File(self.path)
+        root = MockRoot()
+        root.rename("a")
+        _save(store, root)
+        read = []
+        reader = threading.Thread(
+            target=lambda: read.extend(store.get_all_events(root.guid)))
+        reader.daemon = True
+
+        with store._lock:
+            reader.start()
+            reader.join(1.0)
+            self.assertEqual(["a"], [e["name"] for e in read])
+        store.close()
+
+    def test_rolls_segments(self):
+        store = es.File(self.path, segment_size=64)
+        root = MockRoot()
+        for i in range(10):
+            root.rename("name-%d" % i)
+            _save(store, root)
+
+        self.assertTrue(len(store._streams[root.guid]) == 10)
+        self.assertTrue(store._tail[0] > 0)
+        self.assertEqual(
+            ["name-8", "name-9"],
+            [e["name"] for e in store.get_events_from_version(root.guid, 8)])
+
+    def test_reopens_and_recovers_unindexed_records(self):
+        store = es.File(self.path)
+        root = MockRoot()
+        root.rename("a")
+        _save(store, root)
+        root.rename("b")
+        _save(store, root)
+        store.close()
+
+        # Simulate a crash between the segment and the index writes
+        with open(store._index.name, "r+b") as fp:
+            fp.truncate(es.File.INDEX_ENTRY.size)
+
+        store = es.File(self.path)
+        self.assertEqual(
+            ["a", "b"],
+            [e["name"] for e in store.get_all_events(root.guid)])
+        store.close()
+
+
+class SQLiteEventStoreTest(unittest.TestCase):
+    def test_reads_stream_from_version(self):
+        store = es.SQLite()
+        root = MockRoot()
+        child = MockEntity()
+        root.children.add(child)
+        root.rename("a")
+        root.rename("b")
+        child.rename("x")
+        _save(store, root)
+        root.rename("c")
+        _save(store, root)
+
+        self.assertEqual(
+            ["a", "b", "c"],
+            [e["name"] for e in store.get_all_events(root.guid)])
+        self.assertEqual(
+            ["b", "c"],
+            [e["name"] for e in store.get_events_from_version(root.guid, 1)])
+        self.assertEqual(
+            ["x"],
+            [e["name"] for e in store.get_all_events(child.guid)])
+
+    def test_save_is_transactional(self):
+        store = es.SQLite()
+        root = MockRoot()
+        root.rename("a")
+        store.save(root)
+        root.rename("b")
+
+        # Re-saving the staged "a" event conflicts with the stored version 1
+        self.assertRaises(es.ConcurrencyError, store.save, root)
+        self.assertEqual(
+            ["a"],
+            [e["name"] for e in store.get_all_events(root.guid)])
+
+    def test_get_events_for_many(self):
+        store = es.SQLite()
+        store.MAX_STREAMS_PER_QUERY = 1
+        first, second = MockRoot(), MockRoot()
+        first.rename("a")
+        first.rename("b")
+        second.rename("c")
+        _save(store, first)
+        _save(store, second)
+
+        events = store.get_events_for_many({
+            first.guid: 1, second.guid: 0, uuid.uuid4(): 0})
+        self.assertEqual(["b"], [e["name"] for e in events[first.guid]])
+        self.assertEqual(["c"], [e["name"] for e in events[second.guid]])
+        self.assertEqual(3, len(events))
+
+
+class ReadAllTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_reads_global_log_from_position(self):
+        for store in (es.Memory(), es.File(self.path), es.SQLite()):
+            first, second = MockRoot(), MockRoot()
+            first.rename("a")
+            _save(store, first)
+            second.rename("b")
+            _save(store, second)
+            first.rename("c")
+            _save(store, first)
+
+            records = store.read_all()
+            self.assertEqual([1, 2, 3], [x.position for x in records])
+            self.assertEqual(
+                [(first.guid, 1), (second.guid, 1), (first.guid, 2)],
+                [(x.guid, x.version) for x in records])
+            self.assertEqual(
+                ["b"],
+                [x.event["name"] for x in store.read_all(1, batch_size=1)])
+            self.assertEqual([], store.read_all(3))
+
+    def test_stores_binary_marshaled_events(self):
+        marshaler = em.BinaryEventMarshaler({1: MockEvent})
+        store = es.File(self.path, marshaler=marshaler)
+        root = MockRoot()
+        root.rename("a")
+        _save(store, root)
+
+        self.assertEqual(
+            ["a"],
+            [e["name"] for e in store.get_all_events(root.guid)])
+        self.assertEqual(
+            marshaler.marshal(MockEvent(guid=root.guid, name="a")),
+            store._map(0, 0)[es.File.RECORD_HEADER.size:])
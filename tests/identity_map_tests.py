@@ -0,0 +1,93 @@
+import time
+import unittest
+
+import recall.event_router as er
+import recall.event_store as es
+import recall.identity_map as im
+import recall.models as m
+import recall.repository as r
+import recall.snapshot_store as ss
+
+
+class MockEvent(m.Event):
+    def require(self, guid):
+        pass
+
+
+class MockNamedRoot(m.AggregateRoot):
+    @m.handles(MockEvent)
+    def _when_named(self, event):
+        self.guid = event["guid"]
+
+
+class MockRoot(m.AggregateRoot):
+    def __init__(self, children=0):
+        super(MockRoot, self).__init__()
+        self.guid = self._create_guid()
+        self.children = m.EntityList()
+        for _ in range(children):
+            child = m.Entity()
+            child.guid = child._create_guid()
+            self.children.add(child)
+
+
+class LRUTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        identity_map = im.LRU(max_size=2)
+        first, second, third = MockRoot(), MockRoot(), MockRoot()
+        identity_map[first.guid] = first
+        identity_map[second.guid] = second
+        self.assertIs(first, identity_map.get(first.guid))
+        identity_map[third.guid] = third
+
+        self.assertEqual(
+            set([first.guid, third.guid]), set(identity_map.keys()))
+        self.assertIsNone(identity_map.get(second.guid))
+        self.assertEqual(
+            (1, 1, 1),
+            (identity_map.hits, identity_map.misses, identity_map.evictions))
+
+    def test_bounds_total_weight(self):
+        identity_map = im.LRU(max_weight=11)
+        small, large = MockRoot(2), MockRoot(7)
+        identity_map[small.guid] = small
+        self.assertEqual(3, identity_map.weight)
+        identity_map[large.guid] = large
+        self.assertEqual(2, len(identity_map))
+
+        medium = MockRoot(1)
+        identity_map[medium.guid] = medium
+        self.assertNotIn(small.guid, identity_map)
+        self.assertEqual(10, identity_map.weight)
+        self.assertEqual(1, identity_map.evictions)
+
+    def test_expires_roots(self):
+        identity_map = im.LRU(ttl=0.01)
+        root = MockRoot()
+        identity_map[root.guid] = root
+        time.sleep(0.02)
+
+        self.assertIsNone(identity_map.get(root.guid))
+        self.assertEqual(1, identity_map.expirations)
+        self.assertEqual(0, identity_map.weight)
+
+    def test_repository_only_puts_loaded_roots(self):
+        weighed = []
+
+        def weigher(root):
+            weighed.append(root.guid)
+            return 1
+
+        repo = r.Repository(
+            MockNamedRoot, es.Memory(), ss.Memory(), er.StdOut(), 10,
+            identity_map_=im.LRU(ttl=0.05, weigher=weigher))
+        root = MockNamedRoot()
+        root._apply_event(MockEvent(guid=root._create_guid()))
+        repo.save(root)
+
+        for _ in range(3):
+            repo.load(root.guid)
+        self.assertEqual([root.guid], weighed)
+        time.sleep(0.06)
+        repo.load(root.guid)
+        self.assertEqual(1, repo.identity_map.expirations)
@@ -0,0 +1,205 @@
+import abc
+import copy
+import pickle
+import unittest
+
+import recall.models as m
+
+
+class MockEvent(m.Event):
+    def require(self, name, tags=None):
+        assert isinstance(name, str)
+
+
+class OtherEvent(m.Event):
+    def require(self, name):
+        assert isinstance(name, str)
+
+
+class EventTest(unittest.TestCase):
+    def test_event_is_immutable(self):
+        event = MockEvent(name="a", tags=["x", ["y"]])
+
+        with self.assertRaises(AttributeError):
+            event.name = "b"
+        with self.assertRaises(AttributeError):
+            del event._data
+
+        self.assertEqual(("x", ("y",)), event["tags"])
+        self.assertIs(event, copy.copy(event))
+
+    def test_event_is_hashable(self):
+        self.assertEqual(MockEvent(name="a"), MockEvent(name="a"))
+        self.assertEqual(
+            hash(MockEvent(name="a", tags=["x"])),
+            hash(MockEvent(name="a", tags=["x"])))
+        self.assertNotEqual(MockEvent(name="a"), MockEvent(name="b"))
+        self.assertNotEqual(MockEvent(name="a"), OtherEvent(name="a"))
+
+    def test_event_freezes_nested_mappings(self):
+        meta = {"x": 1, "nested": {"y": [2]}}
+        event = MockEvent(name="a", tags=meta)
+        meta["x"] = 3
+
+        self.assertEqual({"x": 1, "nested": {"y": (2,)}}, event["tags"])
+        with self.assertRaises(TypeError):
+            event["tags"]["x"] = 2
+        with self.assertRaises(TypeError):
+            event["tags"]["nested"].update(y=3)
+        self.assertEqual(hash(event), hash(MockEvent(name="a", tags={
+            "x": 1, "nested": {"y": [2]}})))
+        self.assertEqual(event, pickle.loads(pickle.dumps(event, 2)))
+
+
+class MockCompactEvent(m.CompactEvent):
+    def require(self, name, tags=None):
+        assert isinstance(name, str)
+
+
+class CompactEventTest(unittest.TestCase):
+    def test_fields_come_from_require(self):
+        self.assertEqual(("name", "tags"), MockCompactEvent._fields)
+
+        event = MockCompactEvent(name="a")
+        self.assertIsInstance(event, m.Event)
+        self.assertFalse(hasattr(event, "__dict__"))
+        self.assertEqual({"name": "a"}, dict(event))
+        self.assertEqual("a", event["name"])
+        self.assertRaises(KeyError, lambda: event["tags"])
+        self.assertIsNone(event.get("tags"))
+        self.assertEqual(1, len(event))
+
+    def test_compact_event_is_immutable_and_picklable(self):
+        event = MockCompactEvent(name="a", tags=["x"])
+        with self.assertRaises(AttributeError):
+            event.name = "b"
+
+        self.assertEqual(event, MockCompactEvent(name="a", tags=("x",)))
+        self.assertEqual(hash(event), hash(copy.deepcopy(event)))
+        self.assertEqual(event, pickle.loads(pickle.dumps(event)))
+
+        partial = MockCompactEvent(name="a")
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            loaded = pickle.loads(pickle.dumps(partial, protocol))
+            self.assertEqual(partial, loaded)
+            self.assertEqual({"name": "a"}, dict(loaded))
+            self.assertEqual(1, len(loaded))
+
+    def test_has_the_mapping_api_of_events(self):
+        for cls in (MockEvent, MockCompactEvent):
+            event = cls(name="a")
+            self.assertEqual(["name"], sorted(event.keys()))
+            self.assertEqual(["a"], list(event.values()))
+            self.assertEqual([("name", "a")], list(event.items()))
+            self.assertEqual(["name"], list(event.iterkeys()))
+            self.assertEqual(["a"], list(event.itervalues()))
+            self.assertEqual([("name", "a")], list(event.iteritems()))
+            self.assertEqual(["name"], list(event))
+            self.assertEqual(1, len(event))
+            self.assertIn("name", event)
+            self.assertNotIn("tags", event)
+            self.assertEqual("a", event.get("name"))
+            self.assertEqual("x", event.get("tags", "x"))
+            self.assertEqual({"name": "a"}, dict(event))
+            self.assertEqual(event, cls(name="a"))
+            self.assertNotEqual(event, cls(name="b"))
+
+    def test_restores_events_without_require(self):
+        self.assertEqual(
+            MockCompactEvent(name="a", tags=("x",)),
+            MockCompactEvent._restore({"name": "a", "tags": ["x"]}))
+        self.assertEqual(
+            {"name": 1}, dict(MockCompactEvent._restore({"name": 1})))
+        self.assertEqual({"name": 1}, dict(MockEvent._restore({"name": 1})))
+
+
+class EntityTest(unittest.TestCase):
+    def test_registers_child_entities(self):
+        root = m.AggregateRoot()
+        root.child = m.Entity()
+        root.children = m.EntityList(first=m.Entity())
+        root.children["second"] = m.Entity()
+        root.children["second"].child = m.Entity()
+        root.name = "root"
+        self.assertEqual(5, len(list(root._get_all_entities())))
+
+        del root.children["first"]
+        root.child = None
+        self.assertEqual(
+            [root, root.children["second"], root.children["second"].child],
+            list(root._get_all_entities()))
+
+    def test_scans_entities_without_registered_children(self):
+        root = m.AggregateRoot()
+        root.children = m.EntityList(first=m.Entity())
+        del root.__dict__["_child_names"]
+        del root.children.__dict__["_child_keys"]
+
+        root.child = m.Entity()
+        self.assertEqual(
+            set([root, root.child, root.children["first"]]),
+            set(root._get_all_entities()))
+
+    def test_tracks_entities_with_staged_events(self):
+        root = m.AggregateRoot()
+        root.children = m.EntityList()
+        for key in range(10):
+            root.children[key] = m.Entity()
+        orphan = m.Entity()
+        orphan._apply_event(MockEvent(name="before attaching"))
+
+        root.children[3]._apply_event(MockEvent(name="a"))
+        root.children[3]._apply_event(MockEvent(name="b"))
+        root.children["orphan"] = orphan
+        self.assertEqual(
+            [root.children[3], orphan], root._get_dirty_entities())
+        self.assertEqual(3, len(list(root.get_all_events())))
+
+        orphan._clear_events()
+        self.assertEqual([root.children[3]], root._get_dirty_entities())
+
+    def test_tracks_unpickled_roots_without_dirty_entities(self):
+        root = m.AggregateRoot()
+        root.child = m.Entity()
+        root.child._apply_event(MockEvent(name="a"))
+        del root.__dict__["_dirty"]
+        root = pickle.loads(pickle.dumps(root))
+
+        self.assertEqual([root.child], root._get_dirty_entities())
+        root.child._clear_events()
+        root.child._apply_event(MockEvent(name="b"))
+        self.assertEqual([root.child], list(root._dirty.values()))
+
+    def test_dispatches_to_class_handlers(self):
+        class Named(m.Entity):
+            @m.handles(MockEvent, OtherEvent)
+            def _when_named(self, event):
+                self.name = event["name"]
+
+        class Shouting(Named):
+            def _when_named(self, event):
+                self.name = event["name"].upper()
+
+        entity = Shouting()
+        entity._apply_event(MockEvent(name="a"))
+        entity._handle_domain_event(OtherEvent(name="b"))
+        self.assertEqual("B", entity.name)
+        self.assertEqual(
+            {MockEvent: Shouting._when_named.__func__,
+             OtherEvent: Shouting._when_named.__func__},
+            Shouting._event_handlers)
+
+    def test_entities_can_be_abstract(self):
+        class Abstract(m.AggregateRoot):
+            __metaclass__ = abc.ABCMeta
+
+            @abc.abstractmethod
+            def rename(self, name):
+                pass
+
+        class Concrete(Abstract):
+            def rename(self, name):
+                self.name = name
+
+        self.assertRaises(TypeError, Abstract)
+        Concrete().rename("a")
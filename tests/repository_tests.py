@@ -0,0 +1,263 @@
+import Queue
+import threading
+import unittest
+import uuid
+
+import recall.event_handler as eh
+import recall.event_router as er
+import recall.event_store as es
+import recall.models as m
+import recall.repository as r
+import recall.snapshot_policy as sp
+import recall.snapshot_store as ss
+
+
+class MockEvent(m.Event):
+    def require(self, guid, name):
+        assert isinstance(guid, uuid.UUID)
+        assert isinstance(name, str)
+
+
+class WhenMockEvent(eh.DomainEventHandler):
+    def __call__(self, event):
+        self.entity.guid = event["guid"]
+        self.entity.name = event["name"]
+
+
+class MockRoot(m.AggregateRoot):
+    def __init__(self):
+        super(MockRoot, self).__init__()
+        self.name = None
+        self._register_event_handler(MockEvent, WhenMockEvent)
+
+    def rename(self, name):
+        self._apply_event(MockEvent(guid=self.guid or uuid.uuid4(), name=name))
+
+
+class MockChild(m.Entity):
+    def __init__(self):
+        super(MockChild, self).__init__()
+        self.name = None
+        self._register_event_handler(MockEvent, WhenMockEvent)
+
+    def rename(self, name):
+        self._apply_event(MockEvent(guid=self.guid or uuid.uuid4(), name=name))
+
+
+class MockRouter(er.EventRouter):
+    def __init__(self):
+        self.routed = []
+
+    def route(self, event):
+        self.routed.append(event)
+
+
+class RecordingPolicy(sp.EventCount):
+    def __init__(self, frequency):
+        super(RecordingPolicy, self).__init__(frequency)
+        self.loads = []
+
+    def loaded(self, root, events, seconds):
+        self.loads.append((root.guid, events))
+        super(RecordingPolicy, self).loaded(root, events, seconds)
+
+
+class PagingEventStore(es.Memory):
+    batch_size = 2
+
+    def __init__(self):
+        super(PagingEventStore, self).__init__()
+        self.pages = []
+
+    def get_events_from_version(self, guid, version, limit=None):
+        self.pages.append((version, limit))
+        return super(PagingEventStore, self).get_events_from_version(
+            guid, version, limit)
+
+
+class BatchingEventStore(es.Memory):
+    def __init__(self):
+        super(BatchingEventStore, self).__init__()
+        self.batches = []
+
+    def get_events_for_many(self, versions):
+        self.batches.append(len(versions))
+        return super(BatchingEventStore, self).get_events_for_many(versions)
+
+
+def _repository(event_store=None, snapshot_frequency=100):
+    return r.Repository(
+        MockRoot,
+        event_store or es.Memory(),
+        ss.Memory(),
+        MockRouter(),
+        snapshot_frequency)
+
+
+class RepositoryTest(unittest.TestCase):
+    def test_replays_stream_in_pages(self):
+        store = PagingEventStore()
+        repo = _repository(store)
+        root = MockRoot()
+        for name in ("a", "b", "c", "d", "e"):
+            root.rename(name)
+        repo.save(root)
+
+        repo.identity_map.clear()
+        loaded = repo.load(root.guid)
+        self.assertEqual("e", loaded.name)
+        self.assertEqual(5, loaded._version)
+        self.assertEqual([(0, 2), (2, 2), (4, 2)], store.pages)
+
+    def test_load_many_only_loads_misses(self):
+        repo = _repository(snapshot_frequency=2)
+        roots = [MockRoot() for _ in range(3)]
+        for number, root in enumerate(roots):
+            for name in ["name"] * (number + 1):
+                root.rename(name)
+            repo.save(root)
+
+        repo.identity_map.clear()
+        repo.identity_map[roots[0].guid] = roots[0]
+        unknown = uuid.uuid4()
+        loaded = repo.load_many([root.guid for root in roots] + [unknown])
+
+        self.assertIs(roots[0], loaded[0])
+        self.assertEqual([2, 3], [root._version for root in loaded[1:3]])
+        self.assertEqual(roots[1].guid, loaded[1].guid)
+        self.assertIsNone(loaded[3])
+        self.assertNotIn(unknown, repo.identity_map)
+
+    def test_concurrent_save_evicts_root(self):
+        store = es.Memory()
+        first, second = _repository(store), _repository(store)
+        root = MockRoot()
+        root.rename("a")
+        first.save(root)
+
+        copy = second.load(root.guid)
+        copy.rename("b")
+        second.save(copy)
+
+        root.rename("c")
+        self.assertRaises(es.ConcurrencyError, first.save, root)
+        self.assertNotIn(root.guid, first.identity_map)
+        self.assertEqual("b", first.load(root.guid).name)
+
+    def test_takes_snapshots_in_background(self):
+        repo = r.Repository(
+            MockRoot, es.Memory(), ss.Memory(), MockRouter(), 2,
+            snapshot_workers=2)
+        root = MockRoot()
+        root.rename("a")
+        root.rename("b")
+        repo.save(root)
+        root.rename("mutated after save")
+        repo.flush()
+
+        snapshot = repo.snapshot_store.load(root.guid)
+        self.assertEqual((2, "b"), (snapshot._version, snapshot.name))
+        self.assertIsNot(root, snapshot)
+        repo.close()
+
+    def test_background_snapshots_are_not_reported_as_loads(self):
+        policy = RecordingPolicy(2)
+        repo = r.Repository(
+            MockRoot, es.Memory(), ss.Memory(), MockRouter(), 2,
+            snapshot_workers=1, snapshot_policy_=policy)
+        root = MockRoot()
+        for name in ("a", "b", "c"):
+            root.rename(name)
+        repo.save(root)
+        repo.flush()
+        repo.close()
+
+        self.assertEqual(3, repo.snapshot_store.load(root.guid)._version)
+        self.assertEqual([], policy.loads)
+        self.assertFalse(policy.should_snapshot(root, 1))
+
+    def test_snapshots_when_a_save_jumps_over_the_frequency(self):
+        repo = _repository(snapshot_frequency=2)
+        root = MockRoot()
+        root.rename("a")
+        repo.save(root)
+        root.rename("b")
+        root.rename("c")
+        repo.save(root)
+
+        self.assertEqual(3, repo.snapshot_store.load(root.guid)._version)
+
+    def test_catches_up_children_in_one_batch(self):
+        store = BatchingEventStore()
+        repo = _repository(store)
+        root = MockRoot()
+        root.rename("root")
+        root.children = m.EntityList()
+        for number in range(3):
+            child = MockChild()
+            child.rename("child %d" % number)
+            child.child = MockChild()
+            child.child.rename("grandchild %d" % number)
+            root.children.add(child)
+        repo.save(root)
+
+        entities = list(root._get_all_entities())[1:]
+        for entity in entities:
+            entity._version = 0
+            entity.name = None
+        repo._update_children(root)
+
+        self.assertEqual([6], store.batches)
+        self.assertEqual(
+            ["child 0", "child 1", "child 2"],
+            sorted(child.name for child in root.children.values()))
+        self.assertTrue(all(entity._version == 1 for entity in entities))
+
+    def test_trusted_replay_bumps_versions_once_per_batch(self):
+        store = PagingEventStore()
+        repo = r.Repository(
+            MockRoot, store, ss.Memory(), MockRouter(), 100,
+            trusted_replay=True)
+        root = MockRoot()
+        for name in ("a", "b", "c", "d", "e"):
+            root.rename(name)
+        repo.save(root)
+
+        repo.identity_map.clear()
+        loaded = repo.load(root.guid)
+        self.assertEqual(("e", 5), (loaded.name, loaded._version))
+        self.assertEqual([(0, 2), (2, 2), (4, 2)], store.pages)
+
+    def test_dropped_background_snapshot_does_not_reset_the_policy(self):
+        repo = r.Repository(
+            MockRoot, es.Memory(), ss.Memory(), MockRouter(), 2,
+            snapshot_workers=1)
+        repo.snapshot_worker.submit = lambda guid: False
+        root = MockRoot()
+        root.rename("a")
+        root.rename("b")
+        repo.save(root)
+
+        self.assertTrue(repo.snapshot_policy.should_snapshot(root, 0))
+        repo.close()
+
+    def test_routing_errors_leave_the_root_saved_and_clean(self):
+        release = threading.Event()
+        router = er.Batching(
+            [lambda events: release.wait()], batch_size=1, backlog=1,
+            timeout=0.05)
+        repo = r.Repository(MockRoot, es.Memory(), ss.Memory(), router, 100)
+        root = MockRoot()
+        for name in ("a", "b", "c"):
+            root.rename(name)
+
+        self.assertRaises(Queue.Full, repo.save, root)
+        self.assertEqual((3, []), (root._version, root._events))
+        self.assertEqual(3, len(repo.event_store.get_all_events(root.guid)))
+
+        release.set()
+        root.rename("d")
+        repo.save(root)
+        repo.close()
+        self.assertEqual(4, len(repo.event_store.get_all_events(root.guid)))
+
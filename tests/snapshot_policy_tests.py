@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+import recall.models as m
+import recall.snapshot_policy as sp
+
+
+class MockRoot(m.AggregateRoot):
+    def __init__(self):
+        super(MockRoot, self).__init__()
+        self.guid = self._create_guid()
+
+
+class SnapshotPolicyTest(unittest.TestCase):
+    def test_event_count_does_not_skip_over_frequency(self):
+        policy = sp.EventCount(10)
+        root = MockRoot()
+        policy.loaded(root, 4, 0.0)
+
+        self.assertFalse(policy.should_snapshot(root, 3))
+        self.assertTrue(policy.should_snapshot(root, 5))
+        policy.snapshotted(root)
+        self.assertFalse(policy.should_snapshot(root, 9))
+
+    def test_replay_cost_uses_measured_replay_time(self):
+        policy = sp.ReplayCost(threshold=1.0)
+        slow, fast, new = MockRoot(), MockRoot(), MockRoot()
+        policy.loaded(slow, 10, 2.0)
+        policy.loaded(fast, 10, 0.01)
+
+        self.assertTrue(policy.should_snapshot(slow, 1))
+        self.assertFalse(policy.should_snapshot(fast, 1))
+        self.assertFalse(policy.should_snapshot(new, 9))
+        self.assertTrue(policy.should_snapshot(new, 1))
+
+    def test_keeps_counts_for_recently_used_roots_only(self):
+        policy = sp.EventCount(10, max_roots=2)
+        first, second, third = MockRoot(), MockRoot(), MockRoot()
+        policy.should_snapshot(first, 5)
+        policy.should_snapshot(second, 5)
+        policy.should_snapshot(first, 1)
+        policy.should_snapshot(third, 5)
+
+        self.assertEqual([first.guid, third.guid], policy._events.keys())
+
+        policy = sp.ReplayCost(max_roots=1)
+        policy.loaded(first, 10, 1.0)
+        policy.loaded(second, 10, 1.0)
+        self.assertEqual([second.guid], policy._roots.keys())
+
+    def test_can_be_shared_between_threads(self):
+        roots = [MockRoot() for _ in range(4)]
+        errors = []
+
+        def use(policy):
+            try:
+                for i in range(2000):
+                    root = roots[i % len(roots)]
+                    policy.loaded(root, 1, 0.001)
+                    policy.should_snapshot(root, 1)
+                    policy.snapshotted(root)
+            except Exception as e:
+                errors.append(e)
+
+        for policy in (sp.EventCount(max_roots=2), sp.ReplayCost(max_roots=2)):
+            threads = [
+                threading.Thread(target=use, args=(policy,))
+                for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([], errors)
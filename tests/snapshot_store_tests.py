@@ -0,0 +1,173 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import recall.event_handler as eh
+import recall.event_store as es
+import recall.models as m
+import recall.snapshot_codec as sc
+import recall.snapshot_store as ss
+
+
+class MockEvent(m.Event):
+    def require(self, name):
+        pass
+
+
+class MockEventHandler(eh.DomainEventHandler):
+    def __call__(self, event):
+        pass
+
+
+class MockRoot(m.AggregateRoot):
+    def __init__(self):
+        super(MockRoot, self).__init__()
+        self.guid = self._create_guid()
+        self.name = None
+
+
+class FileSnapshotStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_loads_newest_snapshot_and_compacts(self):
+        store = ss.File(self.path, keep=2)
+        root = MockRoot()
+        for version in range(1, 5):
+            root.name = "name-%d" % version
+            root._version = version
+            store.save(root)
+        store.close()
+
+        self.assertEqual(
+            ["%020d.snapshot" % x for x in (3, 4)],
+            sorted(os.listdir(os.path.join(self.path, root.guid.hex))))
+
+        store = ss.File(self.path)
+        loaded = store.load(root.guid)
+        self.assertEqual((4, "name-4"), (loaded._version, loaded.name))
+        self.assertIsNone(store.load(MockRoot().guid))
+        store.close()
+
+    def test_skips_torn_snapshots(self):
+        store = ss.File(self.path, fsync=True)
+        root = MockRoot()
+        for version in (1, 2):
+            root.name = "name-%d" % version
+            root._version = version
+            store.save(root)
+        with open(store._snapshot_path(root.guid, 2), "r+b") as fp:
+            fp.truncate(10)
+
+        loaded = store.load(root.guid)
+        self.assertEqual((1, "name-1"), (loaded._version, loaded.name))
+
+        with open(store._snapshot_path(root.guid, 1), "wb") as fp:
+            pass
+        self.assertIsNone(store.load(root.guid))
+        store.close()
+
+
+class MockChild(m.Entity):
+    def __init__(self, name):
+        super(MockChild, self).__init__()
+        self.guid = self._create_guid()
+        self.name = name
+
+
+class DeltaSnapshotStoreTest(unittest.TestCase):
+    def test_combines_base_and_deltas(self):
+        store = ss.Delta(max_deltas=2)
+        root = MockRoot()
+        root.children = m.EntityList()
+        first, second = MockChild("a"), MockChild("b")
+        root.children.add(first)
+        root.children.add(second)
+        store.save(root)
+
+        first.name, first._version = "a2", 1
+        store.save(root)
+        third = MockChild("c")
+        root.children.add(third)
+        del root.children[second.guid]
+        root.name, root._version = "renamed", 1
+        store.save(root)
+
+        base, _, deltas = store._snapshots[root.guid]
+        self.assertEqual(2, len(deltas))
+        self.assertEqual(1, len(pickle.loads(deltas[0])))
+
+        loaded = store.load(root.guid)
+        self.assertEqual("renamed", loaded.name)
+        self.assertEqual(
+            set([(first.guid, "a2"), (third.guid, "c")]),
+            set((k, v.name) for k, v in loaded.children.items()))
+
+        store.save(root)
+        self.assertEqual([], store._snapshots[root.guid][2])
+        self.assertEqual(
+            "a2", store.load(root.guid).children[first.guid].name)
+
+    def test_attaches_children_added_after_loading_deltas(self):
+        store = ss.Delta()
+        root = MockRoot()
+        root.children = m.EntityList()
+        store.save(root)
+        root.name, root._version = "renamed", 1
+        store.save(root)
+
+        loaded = store.load(root.guid)
+        child = MockChild("a")
+        loaded.children.add(child)
+        child._apply_event(MockEvent(name="renamed"))
+        self.assertEqual(
+            [MockEvent(name="renamed")], list(loaded.get_all_events()))
+
+        event_store = es.Memory()
+        event_store.save(loaded)
+        self.assertEqual(
+            [MockEvent(name="renamed")],
+            event_store.get_all_events(child.guid))
+
+
+class StateCodecSnapshotStoreTest(unittest.TestCase):
+    def test_round_trips_domain_state(self):
+        for compression in (None, "zlib", "bz2"):
+            store = ss.Memory(codec=sc.State(compression))
+            root = MockRoot()
+            root.name = "root"
+            root.children = m.EntityList()
+            child = MockChild("child")
+            child._version = 3
+            child.tags = ["a", None]
+            root.children.add(child)
+            root._version = 7
+            root._register_event_handler(MockEvent, MockEventHandler)
+            root._events.append(MockEvent(name="stale"))
+            store.save(root)
+
+            loaded = store.load(root.guid)
+            self.assertEqual(
+                (root.guid, 7, "root", []),
+                (loaded.guid, loaded._version, loaded.name, loaded._events))
+            self.assertEqual({MockEvent: MockEventHandler}, loaded._handlers)
+            loaded_child = loaded.children[child.guid]
+            self.assertIsInstance(loaded_child, MockChild)
+            self.assertEqual(
+                (3, "child", ["a", None]),
+                (loaded_child._version, loaded_child.name, loaded_child.tags))
+
+    def test_is_smaller_than_a_pickle(self):
+        root = MockRoot()
+        root.children = m.EntityList()
+        for number in range(100):
+            root.children.add(MockChild("child-%d" % number))
+
+        self.assertLess(
+            len(sc.State().encode(root)) * 3,
+            len(sc.Pickle().encode(root)))